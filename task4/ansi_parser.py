@@ -1,59 +1,255 @@
+import io
+import mmap
+import os
+import re
+from collections import deque
+from multiprocessing import Pool
+
+class EditBuffer:
+    # The line being edited, as a gap buffer: the text before the gap in
+    # `left`, the text after it in the deque `right`, so both the gap and the
+    # end of the line can be edited in place.  `cursor` is where the
+    # terminal thinks the cursor is, which may run past either end of the
+    # text; an edit there lands where the slices output[:cursor] /
+    # output[cursor:] would put it, and the gap is only moved when something
+    # is edited.
+    def __init__(self):
+        self.left = []
+        self.right = deque()
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.left) + len(self.right)
+
+    def text(self):
+        return "".join(self.left) + "".join(self.right)
+
+    def _move_gap(self, index):
+        left, right = self.left, self.right
+        if (len(left) > index):
+            right.extendleft(reversed(left[index:]))
+            del left[index:]
+        elif (len(left) < index):
+            popleft = right.popleft
+            left.extend(popleft() for _ in range(index - len(left)))
+
+    def insert(self, text):
+        # text typed at the cursor, which ends up after it
+        if (self.cursor == len(self.left)): # typing at the gap
+            self.left.extend(text)
+            self.cursor += len(text)
+            return
+        while (self.cursor < 0 and text):
+            self._move_gap(max(len(self) + self.cursor, 0))
+            self.left.append(text[0])
+            self.cursor += 1
+            text = text[1:]
+        if (not text): return
+        self._move_gap(min(self.cursor, len(self)))
+        self.left.extend(text)
+        self.cursor += len(text)
+
+    def append(self, ch):
+        # at the end, wherever the cursor is
+        if (self.right): self.right.append(ch)
+        else: self.left.append(ch)
+        self.cursor += 1
+
+    def backspace(self, count=1):
+        # drops the last count characters, wherever the cursor is
+        right, left = self.right, self.left
+        if (right):
+            k = min(count, len(right))
+            for _ in range(k): right.pop()
+            count -= k
+            self.cursor -= k
+        if (count):
+            del left[max(len(left) - count, 0):]
+            self.cursor -= count
+
+    def delete(self):
+        # the character at the cursor
+        n, cursor = len(self), self.cursor
+        if (cursor == -1): # output[:-1] + output[0:]
+            if (not n): return
+            self._move_gap(n)
+            self.left[n-1:n-1] = self.left[:]
+            del self.left[-1]
+        elif (cursor < 0):
+            if (n + cursor >= 0):
+                self._move_gap(n + cursor)
+                self.right.popleft()
+        elif (cursor < n):
+            self._move_gap(cursor)
+            self.right.popleft()
+
+# literal runs, runs of left, right and backspace, \xNN escapes, the
+# other \033[ sequences parse knows, and any other backslash on its own
+TOKENS = re.compile(r"[^\\]+|(?:\\033\[D)+|(?:\\033\[C)+|(?:\\x08)+|\\x[0-9A-Fa-f]{2}"
+                    r"|\\033\[(?:[ACDH]|2J|3~)|\\")
+
+def tokens(input):
+    return TOKENS.findall(input)
+
+# the tokens that move the cursor or delete; a backslash always starts a
+# token, so finding one of these in the text finds the token
+EDITS = re.compile(r"\\(?:033\[(?:[ACD]|3~)|x0[158])")
+# what is left to do in a line without them
+PLAIN = re.compile(r"\\x[0-9A-Fa-f]{2}|\\033\[(?:H|2J)")
+
+def _plain(m):
+    token = m.group()
+    if (token[1] != 'x' or token == r"\x0d"): return ""
+    return chr(int(token[2:], 16))
 
 def parse(input):
-    output = ""
-    cursor = 0
-    i = 0
-    while i < len(input):
-        if (input[i] == '\\'):
-            if (input[i+1] == 'x'):
-                if (input[i+2:i+4] == "01"): cursor = 0
-                elif (input[i+2:i+4] == "03"): return ""
-                elif (input[i+2:i+4] == "05"): cursor = len(output)
-                elif (input[i+2:i+4] == "08"): cursor -= 1; output = output[:-1]
-                elif (input[i+2:i+4] == "0d"): cursor += 1#; output += "\n"
-                else:
-                    if (cursor == len(output)):
-                        output += bytes(input[i:i+4], "utf-8").decode('unicode_escape')
-                        cursor += 1
-                    else:
-                        bottom = output[:cursor]
-                        top = output[cursor:]
-                        output = bottom + bytes(input[i:i+4], "utf-8").decode('unicode_escape') + top
-                        cursor += 1
-                i += 4
-            elif (input[i+1:i+5] == "033["): # I know I know, input validation and all that
-                if (input[i+5] == 'A'): cursor += 1; output += "\x1a"; i += 6
-                elif (input[i+5] == 'C'): cursor += 1; i += 6
-                elif (input[i+5] == 'D'): cursor -= 1; i += 6
-                elif (input[i+5] == 'H'): i += 6
-                elif (input[i+5:i+7] == '2J'): i += 7
-                elif (input[i+5:i+7] == '3~'):
-                    temp = output[:cursor]
-                    temp += output[cursor+1:]
-                    output = temp
-                    i += 7
-            else:
-                if (cursor == len(output)):
-                    output += input[i]
-                    cursor += 1
-                    i += 1
-                else:
-                    bottom = output[:cursor]
-                    top = output[cursor:]
-                    output = bottom + input[i] + top
-                    cursor += 1
-                    i += 1
-        elif (cursor == len(output)):
-            output += input[i]
-            cursor += 1
-            i += 1
-        else:
-            bottom = output[:cursor]
-            top = output[cursor:]
-            output = bottom + input[i] + top
-            cursor += 1
-            i += 1
-    return output
+    if (r"\x03" in input): return "" # ^C drops the line wherever it comes
+    if (EDITS.search(input) is None): # typed straight through
+        return PLAIN.sub(_plain, input)
+    buf = EditBuffer()
+    left = buf.left
+    for token in TOKENS.findall(input):
+        if (token[0] != '\\'):
+            if (buf.cursor == len(left)): # typing at the gap
+                left.extend(token)
+                buf.cursor += len(token)
+            else: buf.insert(token)
+        elif (token.startswith(r"\033[D")): buf.cursor -= len(token) // 6
+        elif (token.startswith(r"\033[C")): buf.cursor += len(token) // 6
+        elif (token == r"\x0d"): buf.cursor += 1#; output += "\n"
+        elif (token.startswith(r"\x08")): buf.backspace(len(token) // 4)
+        elif (token == r"\x01"): buf.cursor = 0
+        elif (token == r"\x05"): buf.cursor = len(buf)
+        elif (token == r"\x03"): return ""
+        elif (token == r"\033[3~"): buf.delete()
+        elif (token == r"\033[A"): buf.append("\x1a")
+        elif (token == r"\033[H" or token == r"\033[2J"): pass
+        elif (token == '\\'): buf.insert(token) # not an escape we know, or cut off
+        else: buf.insert(chr(int(token[2:], 16))) # \xNN
+    return buf.text()
+
+# ttyaudit=<time> w=<terminal> d=<keys> u=<uid> s=<size of d> id=<record>
+# c=<checksum>; d is whatever comes between HEAD and TAIL, and s= counts
+# its characters
+HEAD = re.compile(r"ttyaudit=(?P<ttyaudit>\d+) w=(?P<w>\d+) d=")
+TAIL = re.compile(r" u=(?P<u>\d+) s=(?P<s>\d+) id=(?P<id>\d+) c=(?P<c>\S+)\s*$")
+
+def split_record(line):
+    # -> the (head, tail) matches around d=, or None if line is not a whole
+    # record.  c= has no spaces, so only the real tail reaches the end of the
+    # line, whatever d holds; s= has to agree with what is left for d
+    head = HEAD.match(line)
+    if (head is None): return None
+    tail = TAIL.search(line, head.end())
+    if (tail is None or int(tail.group('s')) != tail.start() - head.end()): return None
+    return head, tail
+
+def fields(line):
+    # -> {'ttyaudit': .., 'w': .., 'd': .., 'u': .., 's': .., 'id': .., 'c': ..}
+    split = split_record(line)
+    if (split is None): return None
+    head, tail = split
+    return dict(head.groupdict(), d=line[head.end():tail.start()], **tail.groupdict())
+
+HISTORY = 1000 # commands kept per terminal for up-arrow recall
+CHUNK = 1 << 22 # bytes of log per task in TerminalSession.feed_file
+
+class TerminalSession:
+    # Rebuilds the commands typed at the terminals of a tty audit log, a
+    # record at a time, and recalls up-arrows (\x1a) from the commands
+    # before them.  Records are told apart by `key`: 'w' gives every
+    # terminal its own history, None one history for the whole log.  s= is
+    # a record's size and id= its number, so neither names a session.  Only
+    # the last `history` commands of each are kept.
+    def __init__(self, key='w', history=HISTORY, unparsed=None):
+        # unparsed: called with each line that is not a ttyaudit record
+        self.key = key
+        self.history = history
+        self.unparsed = unparsed
+        self._histories = {}
+
+    def command(self, line):
+        # -> the command a record runs, or None (^C, or not a record)
+        record = fields(line)
+        if (record is None):
+            if (self.unparsed is not None): self.unparsed(line)
+            return None
+        return self.recall(record[self.key] if self.key else None, parse(record['d']))
+
+    def recall(self, key, command):
+        # command: what parse made of a record's d= -> with its up-arrows
+        # filled in from key's history, or None if it is empty
+        if (command == ""): return None
+        history = self._histories.get(key)
+        if (history is None):
+            history = self._histories[key] = deque(maxlen=self.history)
+        j = command.count('\x1a')
+        if (j != 0):
+            command = (history[-j] if j <= len(history) else "") + command[j:]
+        history.append(command)
+        return command
+
+    def feed(self, lines):
+        # lines: any iterable of records, e.g. an open log -> commands
+        for line in lines:
+            command = self.command(line)
+            if (command is not None): yield command
+
+    def feed_file(self, path, processes=None, chunk=CHUNK):
+        # the commands of a whole log, in order, as feed(open(path)) gives
+        # them: chunks of it are parsed in a pool of processes (os.cpu_count()
+        # by default), and up-arrows recalled here as their results come
+        # back; at most two chunks per process are in flight
+        spans = log_chunks(path, chunk)
+        if (processes == 1):
+            results = (_parse_chunk(path, start, end, self.key) for start, end in spans)
+            for items in results: yield from self._merge(items)
+            return
+        with Pool(processes) as pool:
+            ahead = 2 * (processes or os.cpu_count())
+            pending = deque()
+            for start, end in spans:
+                pending.append(pool.apply_async(_parse_chunk, (path, start, end, self.key)))
+                if (len(pending) > ahead): yield from self._merge(pending.popleft().get())
+            while pending: yield from self._merge(pending.popleft().get())
+
+    def _merge(self, items):
+        for item in items:
+            if (isinstance(item, str)):
+                if (self.unparsed is not None): self.unparsed(item)
+                continue
+            command = self.recall(*item)
+            if (command is not None): yield command
+
+def log_chunks(path, size=CHUNK):
+    # (start, end) byte ranges covering the file, each ending after a newline
+    # (or at the end of the file)
+    with open(path, "rb") as file:
+        n = os.fstat(file.fileno()).st_size
+        if (n == 0): return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while start < n:
+                end = mm.find(b"\n", start + size - 1) if start + size < n else -1
+                end = n if end == -1 else end + 1
+                yield start, end
+                start = end
+
+def read_chunk(path, start, end):
+    # the lines of one range from log_chunks, as `for line in file` gives them
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode("utf-8")
+    return io.StringIO(text, newline=None)
+
+def _parse_chunk(path, start, end, key):
+    # -> (key, parse of d=) per record and the line itself for anything else
+    out = []
+    for line in read_chunk(path, start, end):
+        record = fields(line)
+        if (record is None): out.append(line)
+        else: out.append((record[key] if key else None, parse(record['d'])))
+    return out
 
 if __name__ == '__main__':
     test1 = r"I'm having trouble debugging a segmentation fault in my C program. Can you help me figure out how to trace the cause usig `gdb\033[D\033[D\033[D\033[D\033[D\033[Dn\033[C\033[C\033[C\033[C\033[C\033[C`"
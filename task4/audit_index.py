@@ -0,0 +1,207 @@
+# A columnar index of the records of a tty audit log, kept on disk next to
+# it (audit.log -> audit.log.idx/).  Every record gets a row: its time,
+# terminal, uid, s= size and id= number in arrays, where its d= starts in
+# the log and how many bytes it takes, and the command TerminalSession
+# makes of it, whose first word is also kept as a program number with the
+# rows of each program listed together.  Rows are in time order (log order
+# for equal times), commands being made in log order first, so a merged or
+# clock-skewed log sorts too; a time range is two bisects and a program is
+# a lookup.  The index is rebuilt when the log's size or mtime no longer
+# match.
+#
+#   python audit_index.py [audit.log] [--uid 1000] [--since ts] [--until ts] [--program gagpt]
+#                         [--terminal 3] [--raw]
+import argparse
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+
+import ansi_parser
+
+# column -> array typecode
+COLUMNS = {
+    'time': 'q',
+    'terminal': 'L',
+    'uid': 'L',
+    'size': 'L',
+    'id': 'q',
+    'offset': 'q', # of d= in the log, in bytes
+    'length': 'L', # of d= in bytes
+    'program': 'L', # into AuditIndex.programs
+    'command_offsets': 'q', # into commands, one more than there are rows
+    'by_program': 'L', # rows, grouped by program
+    'program_starts': 'q', # where each program's rows start in by_program
+}
+VERSION = 2
+ROW_COLUMNS = ('time', 'terminal', 'uid', 'size', 'id', 'offset', 'length', 'program') # one item per row
+
+class AuditIndex:
+    def __init__(self, source, key='w'):
+        # key: how TerminalSession tells terminals apart, for up-arrows
+        self.source = source
+        self.key = key
+        for name, typecode in COLUMNS.items():
+            setattr(self, name, array(typecode))
+        self.programs = []
+        self.commands = b""
+        self.unparsed = 0
+        self._log = None
+
+    def __len__(self):
+        return len(self.time)
+
+    @classmethod
+    def build(cls, source, key='w'):
+        index = cls(source, key)
+        session = ansi_parser.TerminalSession(key=key)
+        numbers = {}
+        commands = []
+        pos = 0
+        with open(source, "rb") as file:
+            for raw in file:
+                line = raw.decode("utf-8")
+                split = ansi_parser.split_record(line)
+                if (split is None):
+                    index.unparsed += 1
+                    pos += len(raw)
+                    continue
+                head, tail = split
+                d = line[head.end():tail.start()]
+                index.time.append(int(head.group('ttyaudit')))
+                index.terminal.append(int(head.group('w')))
+                index.uid.append(int(tail.group('u')))
+                index.size.append(int(tail.group('s')))
+                index.id.append(int(tail.group('id')))
+                index.offset.append(pos + head.end()) # everything before d= is ascii
+                index.length.append(len(d.encode("utf-8")))
+                value = dict(head.groupdict(), **tail.groupdict())[key] if key else None
+                command = session.recall(value, ansi_parser.parse(d)) or ""
+                commands.append(command)
+                words = command.split(maxsplit=1)
+                program = words[0] if words else ""
+                if (program not in numbers):
+                    numbers[program] = len(index.programs)
+                    index.programs.append(program)
+                index.program.append(numbers[program])
+                pos += len(raw)
+        if (any(a > b for a, b in zip(index.time, index.time[1:]))):
+            order = sorted(range(len(index)), key=index.time.__getitem__) # stable
+            for name in ROW_COLUMNS:
+                column = getattr(index, name)
+                setattr(index, name, array(column.typecode, [column[row] for row in order]))
+            commands = [commands[row] for row in order]
+        blob = [command.encode("utf-8") for command in commands]
+        index.command_offsets.append(0)
+        for command in blob:
+            index.command_offsets.append(index.command_offsets[-1] + len(command))
+        index.commands = b"".join(blob)
+        # counting sort of the rows by program
+        counts = [0] * len(index.programs)
+        for program in index.program: counts[program] += 1
+        index.program_starts.append(0)
+        for count in counts: index.program_starts.append(index.program_starts[-1] + count)
+        fill = list(index.program_starts[:-1])
+        index.by_program = array('L', [0]) * len(index)
+        for row, program in enumerate(index.program):
+            index.by_program[fill[program]] = row
+            fill[program] += 1
+        return index
+
+    def save(self, directory=None):
+        directory = directory or self.source + ".idx"
+        os.makedirs(directory, exist_ok=True)
+        for name in COLUMNS:
+            with open(os.path.join(directory, name), "wb") as file: getattr(self, name).tofile(file)
+        with open(os.path.join(directory, "commands"), "wb") as file: file.write(self.commands)
+        stat = os.stat(self.source)
+        meta = {'version': VERSION, 'source': os.path.abspath(self.source), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'key': self.key, 'rows': len(self), 'unparsed': self.unparsed,
+                'typecodes': COLUMNS, 'programs': self.programs}
+        # meta last: an index without it is not there
+        with open(os.path.join(directory, "meta.json"), "w") as file: json.dump(meta, file)
+
+    @classmethod
+    def load(cls, source, directory=None):
+        # -> the saved index of source, or None if there is none or it is stale
+        directory = directory or source + ".idx"
+        try:
+            with open(os.path.join(directory, "meta.json")) as file: meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        stat = os.stat(source)
+        if (meta.get('version') != VERSION or meta['typecodes'] != COLUMNS
+                or (meta['size'], meta['mtime_ns']) != (stat.st_size, stat.st_mtime_ns)):
+            return None
+        index = cls(source, meta['key'])
+        index.programs = meta['programs']
+        index.unparsed = meta['unparsed']
+        for name in COLUMNS:
+            column = getattr(index, name)
+            path = os.path.join(directory, name)
+            with open(path, "rb") as file: column.fromfile(file, os.path.getsize(path) // column.itemsize)
+        with open(os.path.join(directory, "commands"), "rb") as file: index.commands = file.read()
+        if (len(index) != meta['rows']): return None
+        return index
+
+    @classmethod
+    def open(cls, source, key='w', directory=None):
+        # the saved index if it is current and made with key, else a new one, saved
+        index = cls.load(source, directory)
+        if (index is None or index.key != key):
+            index = cls.build(source, key)
+            index.save(directory)
+        return index
+
+    def between(self, since=None, until=None):
+        # -> range of the rows with since <= time <= until
+        start = 0 if since is None else bisect_left(self.time, since)
+        end = len(self) if until is None else bisect_right(self.time, until)
+        return range(start, max(start, end))
+
+    def rows_of(self, program):
+        # -> the rows whose command starts with program, in order
+        if (program not in self.programs): return []
+        number = self.programs.index(program)
+        return self.by_program[self.program_starts[number]:self.program_starts[number + 1]]
+
+    def select(self, uid=None, since=None, until=None, program=None, terminal=None):
+        # -> the rows that match all of the given fields, in order
+        rows = self.between(since, until)
+        if (program is not None):
+            program_rows = self.rows_of(program)
+            start, end = bisect_left(program_rows, rows.start), bisect_left(program_rows, rows.stop)
+            rows = program_rows[start:end]
+        if (uid is not None): rows = [row for row in rows if self.uid[row] == uid]
+        if (terminal is not None): rows = [row for row in rows if self.terminal[row] == terminal]
+        return list(rows)
+
+    def command(self, row):
+        return self.commands[self.command_offsets[row]:self.command_offsets[row + 1]].decode("utf-8")
+
+    def raw(self, row):
+        # d= as it is in the log, read through an mmap of it
+        if (self._log is None):
+            with open(self.source, "rb") as file:
+                self._log = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self.offset[row]
+        return self._log[start:start + self.length[row]].decode("utf-8")
+
+    def record(self, row):
+        return {'ttyaudit': self.time[row], 'w': self.terminal[row], 'd': self.raw(row), 'u': self.uid[row],
+                's': self.size[row], 'id': self.id[row], 'command': self.command(row)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", nargs='?', default="audit.log")
+    parser.add_argument("--uid", type=int)
+    parser.add_argument("--since", type=int)
+    parser.add_argument("--until", type=int)
+    parser.add_argument("--program")
+    parser.add_argument("--terminal", type=int)
+    parser.add_argument("--raw", action='store_true', help="print d= as logged, not the command")
+    args = parser.parse_args()
+    index = AuditIndex.open(args.log)
+    for row in index.select(args.uid, args.since, args.until, args.program, args.terminal):
+        print(index.time[row], index.terminal[row], index.raw(row) if args.raw else index.command(row))
@@ -0,0 +1,122 @@
+# Checks ansi_parser.parse against the original string-slicing version on
+# every d= field of an audit log and on random edits, and that cut off
+# escapes read as text, then times both on the log and on one long line
+# edited in the middle.  Last, parse alone on lines that type and erase at
+# the end while the cursor sits in the middle, at two lengths: the time
+# should no more than double.
+#
+#   python bench_ansi_parser.py [audit.log.bak] [runs]
+import random
+import sys
+import time
+
+import ansi_parser
+
+KEYS = [r"\x01", r"\x03", r"\x05", r"\x08", r"\x0d", r"\x41", r"\033[A", r"\033[C", r"\033[D",
+        r"\033[H", r"\033[2J", r"\033[3~", "\\", "a", "b", "c", " "]
+
+# the original string-slicing parse, to check parse against
+def parse_slicing(input):
+    output = ""
+    cursor = 0
+    i = 0
+    while i < len(input):
+        if (input[i] == '\\'):
+            if (input[i+1] == 'x'):
+                if (input[i+2:i+4] == "01"): cursor = 0
+                elif (input[i+2:i+4] == "03"): return ""
+                elif (input[i+2:i+4] == "05"): cursor = len(output)
+                elif (input[i+2:i+4] == "08"): cursor -= 1; output = output[:-1]
+                elif (input[i+2:i+4] == "0d"): cursor += 1#; output += "\n"
+                else:
+                    if (cursor == len(output)):
+                        output += bytes(input[i:i+4], "utf-8").decode('unicode_escape')
+                        cursor += 1
+                    else:
+                        bottom = output[:cursor]
+                        top = output[cursor:]
+                        output = bottom + bytes(input[i:i+4], "utf-8").decode('unicode_escape') + top
+                        cursor += 1
+                i += 4
+            elif (input[i+1:i+5] == "033["): # I know I know, input validation and all that
+                if (input[i+5] == 'A'): cursor += 1; output += "\x1a"; i += 6
+                elif (input[i+5] == 'C'): cursor += 1; i += 6
+                elif (input[i+5] == 'D'): cursor -= 1; i += 6
+                elif (input[i+5] == 'H'): i += 6
+                elif (input[i+5:i+7] == '2J'): i += 7
+                elif (input[i+5:i+7] == '3~'):
+                    temp = output[:cursor]
+                    temp += output[cursor+1:]
+                    output = temp
+                    i += 7
+            else:
+                if (cursor == len(output)):
+                    output += input[i]
+                    cursor += 1
+                    i += 1
+                else:
+                    bottom = output[:cursor]
+                    top = output[cursor:]
+                    output = bottom + input[i] + top
+                    cursor += 1
+                    i += 1
+        elif (cursor == len(output)):
+            output += input[i]
+            cursor += 1
+            i += 1
+        else:
+            bottom = output[:cursor]
+            top = output[cursor:]
+            output = bottom + input[i] + top
+            cursor += 1
+            i += 1
+    return output
+
+def fields(path):
+    with open(path) as file:
+        for line in file:
+            record = ansi_parser.fields(line)
+            if (record is not None):
+                yield record['d']
+
+def random_edit(rng):
+    out = [k for k in (rng.choice(KEYS) for _ in range(rng.randint(0, 40))) if k != r"\x03" or rng.random() < .05]
+    while (out and out[-1] == "\\"): out.pop()
+    return "".join(out)
+
+def check(lines, rng):
+    for d in lines:
+        assert ansi_parser.parse(d) == parse_slicing(d), d
+    for _ in range(20000):
+        d = random_edit(rng)
+        assert ansi_parser.parse(d) == parse_slicing(d), d
+    # cut off escapes, which parse_slicing raises on, are read as text
+    for d in ("ls\\", "ls\\x", "ls\\x0", "ls\\xZZ", "ls\\033", "ls\\033[", "ls\\033[3", "ls\\033[B"):
+        assert ansi_parser.parse(d) == d, d
+
+def timed(parse, lines, runs):
+    t = time.perf_counter()
+    for _ in range(runs):
+        for d in lines: parse(d)
+    return (time.perf_counter() - t) / runs
+
+def main(path="audit.log.bak", runs=5):
+    lines = list(fields(path))
+    check(lines, random.Random(1))
+    print(f"{len(lines)} lines and 20000 random edits parse the same")
+    long = ["x" * 100000 + r"\033[D" * 50000 + "y" * 100000 + r"\x08" * 100 + r"\x0d"]
+    for name, data, n in (("audit log", lines, runs), ("one 200k edited line", long, 1)):
+        old, new = timed(parse_slicing, data, n), timed(ansi_parser.parse, data, n)
+        print(f"{name:<20} parse_slicing {old:8.3f} s   parse {new:8.3f} s   ({old / new:.1f}x)")
+    short = middle_edits(2000)
+    assert ansi_parser.parse(short) == parse_slicing(short)
+    for n in (40000, 80000):
+        print(f"{'edits at the end, n=%d' % n:<28} parse {timed(ansi_parser.parse, [middle_edits(n)], 1):8.3f} s")
+
+def middle_edits(n):
+    # n characters, the cursor back to the middle, then n times an
+    # insert at the cursor and a backspace (which drops the last character)
+    return "x" * n + r"\033[D" * (n // 2) + ("a" + r"\x08") * n
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
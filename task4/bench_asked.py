@@ -0,0 +1,64 @@
+# Time and memory of telling repeated gagpt commands apart, as
+# get_queries.py does, with ResponseCache.first_asked against a set of the
+# commands, for `n` commands and ten times as many, close to half of them
+# repeats.  Both must pick the same ones.  Each runs in a process of its own
+# and reports how much its peak resident size grew, since SQLite's memory is
+# not Python's.
+#
+#   python bench_asked.py [n]
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+from multiprocessing import Pool
+
+import response_cache
+
+def commands(n, seed=1):
+    rng = random.Random(seed)
+    for _ in range(n):
+        q = rng.randrange(n * 3 // 4)
+        yield 'gagpt -m "question %d about %s"' % (q, "x" * (q % 80))
+
+def with_set(n):
+    seen = set()
+    for command in commands(n):
+        if (command in seen): continue
+        seen.add(command)
+        yield command
+
+def with_cache(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = response_cache.ResponseCache(os.path.join(tmp, "responses.db"))
+        for command in commands(n):
+            if (cache.first_asked(command)): yield command
+        cache.close()
+
+def measure(args):
+    # in a fresh process -> (first commands, count, seconds, kB the peak grew by)
+    name, n = args
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t = time.perf_counter()
+    count, digest = 0, 0
+    for command in {'set': with_set, 'cache': with_cache}[name](n):
+        count += 1
+        digest = zlib.crc32(command.encode(), digest)
+    seconds = time.perf_counter() - t
+    return digest, count, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+def main(n=100000):
+    for size in (n, 10 * n):
+        results = {}
+        for name in ('set', 'cache'):
+            with Pool(1, maxtasksperchild=1) as pool:
+                results[name] = pool.apply(measure, ((name, size),))
+        assert results['set'][:2] == results['cache'][:2]
+        print("%8d commands, %7d first  set %6.3f s %7.1f MB   first_asked %6.3f s %7.1f MB" %
+              (size, results['set'][1], results['set'][2], results['set'][3] / 1e3,
+               results['cache'][2], results['cache'][3] / 1e3))
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
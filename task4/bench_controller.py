@@ -0,0 +1,64 @@
+# Throughput of fetch_all against a local gagpt_server.py that takes `delay`
+# ms per answer and throttles (429) past `limit` requests at once or `rate`
+# a second, or queues past `limit` at once, and one that takes `fast` ms and
+# throttles past `fast_rate` a second: at a few fixed concurrencies,
+# then with fetch.Controller finding its own.  The controller's runs have to
+# get every answer, in order; the fixed ones report how many they lost to
+# throttling.  Against the queueing server nothing is lost, only latency,
+# which the controller's target has to keep down.  Against the fast one even
+# one request at a time is too many, so the controller has to space them.
+#
+#   python bench_controller.py [queries] [delay ms] [limit] [rate] [fast ms] [fast rate]
+import statistics
+import sys
+import tempfile
+import time
+
+import fetch
+import gagpt_server
+
+class TimedPool(fetch.ConnectionPool):
+    # keeps how long each request took
+    def get_response(self, path):
+        t = time.monotonic()
+        try: return super().get_response(path)
+        finally: self.latencies.append(time.monotonic() - t)
+
+def run(queries, server, pool, concurrency=None, controller=None):
+    # -> (answers, throttled by the server, seconds, median latency)
+    before = server.throttled
+    pool.latencies = []
+    t = time.perf_counter()
+    got = list(fetch.fetch_all(queries, pool, concurrency or fetch.CONCURRENCY, controller=controller))
+    return got, server.throttled - before, time.perf_counter() - t, statistics.median(pool.latencies)
+
+def main(n=600, delay=20, limit=12, rate=0, fast=5, fast_rate=150):
+    queries = ["What is %d + %d?" % (i, i) for i in range(n)]
+    per_second = rate or limit * 1000 // delay // 2
+    with tempfile.TemporaryDirectory() as tmp:
+        certs = gagpt_server.make_certs(tmp)
+        for name, ms, kwargs in (("throttled past %d at once" % limit, delay, dict(max_in_flight=limit)),
+                                 ("throttled past %d a second" % per_second, delay, dict(rate=per_second)),
+                                 ("queued past %d at once" % limit, delay, dict(capacity=limit)),
+                                 ("throttled past %d a second" % fast_rate, fast, dict(rate=fast_rate))):
+            server = gagpt_server.GagptServer(certs, delay_ms=ms, **kwargs)
+            host, port = server.start()
+            pool = TimedPool(host, port, fetch.client_context(certs['client'], cafile=certs['ca']))
+            expected = [(q, *server.respond(q)) for q in queries]
+            print("%d queries, %d ms each, %s" % (n, ms, name))
+            for c in (4, limit, 4 * limit):
+                got, throttled, seconds, latency = run(queries, server, pool, c)
+                good = sum(1 for answer in got if answer[1] == 200)
+                print("  %-22s %7.1f req/s %5d answered %5d throttled %6.1f ms median" %
+                      ("fixed, %d at a time" % c, good / seconds, good, throttled, latency * 1000))
+            controller = fetch.Controller(start=2, high=4 * limit)
+            got, throttled, seconds, latency = run(queries, server, pool, controller=controller)
+            assert got == expected
+            print("  %-22s %7.1f req/s %5d answered %5d throttled %6.1f ms median, window %.1f, at most %.1f" %
+                  ("controller", n / seconds, n, throttled, latency * 1000, controller.window, controller.peak))
+            print("  " + controller.report())
+            pool.close()
+            server.shutdown()
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:7]))
@@ -0,0 +1,38 @@
+# Checks TerminalSession.feed_file against feed on an audit log copied
+# `copies` times over, for a few pool sizes and chunk sizes, then times
+# both.  feed_file only gets faster with more than one core to run on.
+#
+#   python bench_feed_file.py [audit.log.bak] [copies] [processes]
+import os
+import sys
+import tempfile
+import time
+
+import ansi_parser
+
+def main(path="audit.log.bak", copies=50, processes=None):
+    with open(path) as file: log = file.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        big = os.path.join(tmp, "audit.log")
+        with open(big, "w") as file: file.write(log * copies)
+        for key in ('w', None):
+            with open(big) as file:
+                reference = list(ansi_parser.TerminalSession(key=key).feed(file))
+            for n in (1, 2, 4):
+                for chunk in (1000, 1 << 16, ansi_parser.CHUNK):
+                    got = list(ansi_parser.TerminalSession(key=key).feed_file(big, n, chunk))
+                    assert got == reference, (key, n, chunk)
+        print(f"{len(reference)} commands, feed_file agrees with feed")
+
+        t = time.perf_counter()
+        with open(big) as file: list(ansi_parser.TerminalSession().feed(file))
+        feed = time.perf_counter() - t
+        t = time.perf_counter()
+        list(ansi_parser.TerminalSession().feed_file(big, processes))
+        pooled = time.perf_counter() - t
+        print(f"{os.path.getsize(big) >> 10} kB, {os.cpu_count()} cpus")
+        print(f"feed       {feed:7.3f} s")
+        print(f"feed_file  {pooled:7.3f} s ({feed / pooled:.1f}x, {processes or os.cpu_count()} processes)")
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:4]))
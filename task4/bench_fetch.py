@@ -0,0 +1,59 @@
+# Fetches `queries` distinct queries from a local gagpt_server.py that takes
+# `delay` ms per answer: a new connection per query one at a time, as
+# requests.get did, then through fetch.py's pool one at a time and
+# `concurrency` at a time.  Checks that every way gets the same answers in
+# the same order, and that the server turns away clients with no
+# certificate.
+#
+#   python bench_fetch.py [queries] [delay ms] [concurrency]
+import http.client
+import ssl
+import sys
+import tempfile
+import time
+
+import fetch
+import gagpt_server
+
+def unpooled(queries, host, port, context):
+    for query in queries:
+        connection = http.client.HTTPSConnection(host, port, context=context)
+        connection.request("GET", fetch.query_path(query))
+        response = connection.getresponse()
+        yield query, response.status, response.read().decode("utf-8")
+        connection.close()
+
+def main(n=200, delay=20, concurrency=fetch.CONCURRENCY):
+    queries = ["What is %d + %d?" % (i, i) for i in range(n)] + ["error please"]
+    with tempfile.TemporaryDirectory() as tmp:
+        certs = gagpt_server.make_certs(tmp)
+        server = gagpt_server.GagptServer(certs, delay_ms=delay)
+        host, port = server.start()
+        context = fetch.client_context(certs['client'], cafile=certs['ca'])
+
+        bare = ssl.create_default_context(cafile=certs['ca'])
+        try:
+            list(unpooled(queries[:1], host, port, bare))
+            raise AssertionError("served a client with no certificate")
+        except (ssl.SSLError, OSError, http.client.HTTPException):
+            pass
+
+        expected = [(q, *server.respond(q)) for q in queries]
+        print("%d queries, %d ms each" % (len(queries), delay))
+        runs = [("connection per query", None, lambda: unpooled(queries, host, port, context))]
+        for c in (1, concurrency):
+            pool = fetch.ConnectionPool(host, port, context)
+            runs.append(("pooled, %d at a time" % c, pool, lambda pool=pool, c=c: fetch.fetch_all(queries, pool, c)))
+        for name, pool, run in runs:
+            before = server.connections
+            t = time.perf_counter()
+            got = list(run())
+            seconds = time.perf_counter() - t
+            assert got == expected, name
+            print("%-24s %7.3f s %8.1f req/s %5d handshakes" % (name, seconds, len(queries) / seconds,
+                                                               server.connections - before))
+            if (pool is not None): pool.close()
+        server.shutdown()
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:4]))
@@ -0,0 +1,82 @@
+# Builds response_index.py's index over the answers in `source` copied
+# `copies` times, checks some searches and their top k against a scan of
+# every answer, scored one by one, then times searches on it: the median of
+# `runs`, with the index already open.
+#
+#   python bench_response_index.py [responses.json] [copies] [runs]
+import heapq
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import response_index
+
+QUERIES = ['analyzer', 'logic analyzer', '"logic analyzer"', 'python OR rust -java',
+           '(gdb OR lldb) AND NOT "segmentation fault"', '"memory leak" valgrind', 'the', '-python', 'zzzqqq']
+
+def scan(tree, words):
+    # whether the words of an answer match a parse_query tree
+    kind, arg = tree
+    if (kind == 'phrase'): return any(words[i:i + len(arg)] == arg for i in range(len(words)))
+    if (kind == 'not'): return not scan(arg, words)
+    if (kind == 'or'): return any(scan(term, words) for term in arg)
+    return all(scan(term, words) for term in arg)
+
+def main(source="responses.json", copies=20, runs=50):
+    responses = [response for _, _, response in response_index.read_source(source)]
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, "responses.jsonl")
+        with open(jsonl, "w") as file:
+            for _ in range(copies):
+                for response in responses: file.write(json.dumps(response) + "\n")
+        t = time.perf_counter()
+        directory = response_index.build(jsonl)
+        built = time.perf_counter() - t
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        index = response_index.ResponseIndex(directory)
+        print("%d answers, %d words, built in %.1f s, %.1f MB on disk" %
+              (index.answers, index.words, built, size / 1e6))
+        words = [response_index.words(r["prompt"]) + [""] + response_index.words(r["fulfillment"][0]["text"])
+                 for r in responses]
+        counts = [Counter(w) for w in words]
+        for query in QUERIES:
+            tree = response_index.parse_query(query)
+            once = {n for n, w in enumerate(words) if scan(tree, w)}
+            found = {k * len(responses) + n for k in range(copies) for n in once}
+            assert index.match(tree) == found, query
+            positive = sorted(set(response_index._positive_words(tree)))
+            df = {word: copies * sum(1 for c in counts if word in c) for word in positive}
+
+            def score(doc):
+                c, length, score = counts[doc % len(responses)], len(words[doc % len(responses)]) - 1, 0.0
+                for word in positive:
+                    if (c[word]):
+                        idf = math.log(1 + (index.answers - df[word] + 0.5) / (df[word] + 0.5))
+                        score += idf * response_index.weight(c[word], length, index.average)
+                return score
+
+            ranked = heapq.nlargest(100, ((score(doc), doc) for doc in found), key=lambda hit: (hit[0], -hit[1]))
+            for k in (1, 10, 100): assert index.search(query, k) == ranked[:k], (query, k)
+        print("searches and their top k match a scan of every answer")
+        print("%-44s %8s %10s %10s" % ("query", "matches", "match ms", "top 10 ms"))
+        for query in QUERIES:
+            tree = response_index.parse_query(query)
+            matching, ranking = [], []
+            for _ in range(runs):
+                t = time.perf_counter()
+                found = index.match(tree)
+                matching.append(time.perf_counter() - t)
+                t = time.perf_counter()
+                index.search(query)
+                ranking.append(time.perf_counter() - t)
+            print("%-44s %8d %10.3f %10.3f" % (query, len(found), statistics.median(matching) * 1000,
+                                             statistics.median(ranking) * 1000))
+        index.close()
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:4]))
@@ -0,0 +1,230 @@
+# Fetches gagpt answers over mutual TLS.  Connections are kept open and
+# handed from one request to the next, so the handshake with the client
+# certificate is paid once per connection rather than once per query, and
+# several requests are in flight at once.  Answers come back in the order
+# the queries were given.
+import http.client
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from queue import Empty, Queue
+
+HOST = '34.195.208.56'
+CERT = ("client.crt", "client.key")
+CONCURRENCY = 8
+RETRY = (429, 500, 502, 503, 504) # statuses worth asking again
+THROTTLE = (429, 503) # statuses that mean too much at once
+SLOW = 2 # an answer is slow past this many times the usual latency
+SAMPLES = 32 # answers per median latency
+
+def client_context(cert=CERT, cafile=None):
+    # the server's certificate is only checked if cafile is given, as with
+    # verify=False before
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    if (cafile is None):
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    else: context.load_verify_locations(cafile)
+    context.load_cert_chain(*cert)
+    return context
+
+def query_path(query):
+    return "/?q=" + urllib.parse.quote_plus(query)
+
+class ConnectionPool:
+    # Keep-alive connections to one server, each used by one request at a
+    # time.  A new one is opened when none is idle, so there are at most as
+    # many as there were requests in flight at once.
+    def __init__(self, host=HOST, port=443, context=None, timeout=60):
+        self.host = host
+        self.port = port
+        self.context = context or client_context()
+        self.timeout = timeout
+        self.connections = 0 # opened so far, i.e. handshakes
+        self._idle = Queue()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock: self.connections += 1
+        return http.client.HTTPSConnection(self.host, self.port, context=self.context, timeout=self.timeout)
+
+    def get(self, path):
+        # -> (status, body)
+        return self.get_response(path)[:2]
+
+    def get_response(self, path):
+        # -> (status, body, headers)
+        try:
+            connection, reused = self._idle.get_nowait(), True
+        except Empty:
+            connection, reused = self._connect(), False
+        while True:
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                body = response.read().decode("utf-8")
+                break
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if (not reused): raise
+                # the server closed it while it was idle; once more on a new one
+                connection, reused = self._connect(), False
+        if (response.will_close): connection.close()
+        else: self._idle.put(connection)
+        return response.status, body, response.headers
+
+    def close(self):
+        while True:
+            try: self._idle.get_nowait().close()
+            except Empty: return
+
+class Controller:
+    # How many requests are in flight, set AIMD-style: the window grows by
+    # one for each window's worth of answers that came back fine and within
+    # `target` seconds, doubling each round trip until it is first cut, and
+    # halves when the server throttles (THROTTLE), a connection fails or an
+    # answer is slow, at most once for the requests that were already out.
+    # Without a target it is SLOW times the usual latency: the lowest median
+    # of SAMPLES answers so far, so queueing the window itself causes does
+    # not raise it.  A throttled request also doubles the least `interval`
+    # between sends, from at least the usual latency over the window, so a
+    # rate limit is kept to even when one request at a time is too many;
+    # each fine answer takes a SAMPLES'th off it again.  RETRY statuses and
+    # connection errors are tried again up to `retries` times, after a
+    # jittered exponential backoff or the Retry-After the server asked for.
+    def __init__(self, start=CONCURRENCY, low=1, high=64, target=None, retries=5, backoff=0.1, cap=10):
+        self.window = float(start)
+        self.low = low
+        self.high = high
+        self.target = target
+        self.usual = None # lowest median latency so far, in seconds
+        self._latencies = []
+        self.retries = retries
+        self.backoff = backoff
+        self.cap = cap
+        self.in_flight = 0
+        self.interval = 0.0 # least seconds between sends
+        self._sent = None # when the last request went out, or is due to
+        self.peak = self.window
+        self.answered = 0
+        self.attempts = 0
+        self.retried = 0
+        self.throttled = 0
+        self.started = time.monotonic()
+        self._cut = self.started # when the window was last halved
+        self._slow_start = True
+        self._lock = threading.Condition()
+
+    def _acquire(self):
+        with self._lock:
+            while self.in_flight >= int(self.window): self._lock.wait()
+            self.in_flight += 1
+            self.attempts += 1
+            now = time.monotonic()
+            send = now if self._sent is None else max(now, self._sent + self.interval)
+            self._sent = send
+        if (send > now): time.sleep(send - now)
+        return send
+
+    def _release(self, start, slow_down, throttled=False):
+        with self._lock:
+            self.in_flight -= 1
+            if (not slow_down):
+                self.window = min(self.high, self.window + (1 if self._slow_start else 1 / self.window))
+                self.peak = max(self.peak, self.window)
+                self.interval -= self.interval / SAMPLES
+            elif (start > self._cut): # sent after the last cut, so it is news
+                if (throttled):
+                    latency = self.usual if self.usual is not None else time.monotonic() - start
+                    self.interval = max(2 * self.interval, latency / self.window)
+                self.window = max(self.low, self.window / 2)
+                self._cut = max(time.monotonic(), self._sent) # sends already due are old news too
+                self._slow_start = False
+            self._lock.notify_all()
+
+    def _wait(self, attempt, retry_after=None):
+        delay = min(self.cap, self.backoff * 2 ** attempt)
+        delay = random.uniform(delay / 2, delay)
+        try: delay = max(delay, float(retry_after))
+        except (TypeError, ValueError): pass
+        time.sleep(delay)
+
+    def get(self, pool, path):
+        # pool.get within the window, with retries -> (status, body)
+        for attempt in range(self.retries + 1):
+            start = self._acquire()
+            try:
+                status, body, headers = pool.get_response(path)
+            except (http.client.HTTPException, OSError):
+                self._release(start, True)
+                if (attempt == self.retries): raise
+                with self._lock: self.retried += 1
+                self._wait(attempt)
+                continue
+            slow = self._slow(time.monotonic() - start, status)
+            self._release(start, status in THROTTLE or slow, status in THROTTLE)
+            with self._lock:
+                if (status in THROTTLE): self.throttled += 1
+                if (status not in RETRY or attempt == self.retries):
+                    self.answered += 1
+                    return status, body
+                self.retried += 1
+            self._wait(attempt, headers.get("Retry-After"))
+
+    def _slow(self, latency, status):
+        # -> whether an answer took longer than the target
+        with self._lock:
+            target = self.target
+            if (target is None):
+                target = SLOW * self.usual if self.usual is not None else None
+                if (status not in RETRY):
+                    self._latencies.append(latency)
+                    if (len(self._latencies) == SAMPLES):
+                        median = sorted(self._latencies)[SAMPLES // 2]
+                        self.usual = median if self.usual is None else min(self.usual, median)
+                        self._latencies = []
+        return target is not None and latency > target
+
+    def report(self):
+        seconds = time.monotonic() - self.started
+        target = self.target if self.target is not None else SLOW * self.usual if self.usual is not None else None
+        return ("%d answers in %.1f s, %.1f req/s; %d requests, %d retried, %d throttled; window %.1f, at most %.1f; "
+                "interval %.1f ms; target %s" % (self.answered, seconds, self.answered / seconds, self.attempts,
+                                                 self.retried, self.throttled, self.window, self.peak,
+                                                 self.interval * 1000,
+                                                 "-" if target is None else "%.0f ms" % (target * 1000)))
+
+def fetch_all(queries, pool, concurrency=CONCURRENCY, cache=None, controller=None):
+    # queries: any iterable, read as requests go out -> (query, status, body)
+    # in the order of queries; `concurrency` requests run at once and at
+    # most as many again wait their turn.  With a controller, it decides
+    # how many run at once, up to its `high`, and retries.  With a cache
+    # (response_cache.ResponseCache), what it has is answered from it and
+    # what is fetched is added to it.
+    get = pool.get if controller is None else partial(controller.get, pool)
+    workers = concurrency if controller is None else controller.high
+    with ThreadPoolExecutor(workers) as executor:
+        pending = deque()
+
+        def done():
+            query, future, fetched = pending.popleft()
+            status, body = future.result()
+            if (fetched and cache is not None): cache.put(query, status, body)
+            return query, status, body
+
+        for query in queries:
+            answer = cache.get(query) if cache is not None else None
+            if (answer is None):
+                pending.append((query, executor.submit(get, query_path(query)), True))
+            else:
+                future = Future()
+                future.set_result(answer)
+                pending.append((query, future, False))
+            while pending and pending[0][1].done(): yield done()
+            if (len(pending) >= 2 * workers): yield done()
+        while pending: yield done()
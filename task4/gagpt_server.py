@@ -0,0 +1,135 @@
+# A local stand-in for the gagpt endpoint get_queries.py asks.  It speaks
+# HTTPS, wants a client certificate signed by its CA, and answers
+# GET /?q=<query> with the JSON the real one sends, after `delay_ms`.  Queries
+# starting with "error" get a 500.  It can also throttle: past
+# `max_in_flight` requests at once, or `rate` a second, requests get a 429
+# straight away.  Or it can slow down: past `capacity` requests at once, the
+# rest wait their turn.  make_certs writes, with openssl, a CA and a server
+# and a client certificate signed by it.
+#
+#   python gagpt_server.py [directory] [port] [delay ms] [max in flight] [rate] [capacity]
+import contextlib
+import json
+import os
+import ssl
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def make_certs(directory):
+    # -> {'ca': .., 'server': (crt, key), 'client': (crt, key)} in directory
+    def openssl(*args):
+        subprocess.run(("openssl",) + args, cwd=directory, check=True, capture_output=True)
+    key = ("-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1", "-nodes")
+    openssl("req", "-x509", *key, "-keyout", "ca.key", "-out", "ca.crt", "-days", "2", "-subj", "/CN=stand-in CA")
+    for name, extra in (("server", ("-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost")), ("client", ())):
+        openssl("req", *key, "-keyout", name + ".key", "-out", name + ".csr", "-subj", "/CN=" + name, *extra)
+        openssl("x509", "-req", "-in", name + ".csr", "-CA", "ca.crt", "-CAkey", "ca.key", "-CAcreateserial",
+                "-out", name + ".crt", "-days", "2", "-copy_extensions", "copyall")
+    path = lambda name: os.path.join(directory, name)
+    return {'ca': path("ca.crt"), 'server': (path("server.crt"), path("server.key")),
+            'client': (path("client.crt"), path("client.key"))}
+
+def answer(query):
+    # shaped as the real answers are
+    return {"fulfillment": [{"index": 0, "role": "assistant", "text": "You asked: <" + query + ">"}],
+            "id": str(uuid.uuid5(uuid.NAMESPACE_URL, query)), "lang": "en", "model": "gagpt-xl", "prompt": query,
+            "upstream": "stand-in"}
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive
+    disable_nagle_algorithm = True # headers and body go out as separate writes
+
+    def do_GET(self):
+        server = self.server
+        with server.lock: server.requests += 1
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).get("q", [""])[0]
+        if (not server.admit()):
+            status, body = 429, json.dumps({"error": "too many requests"})
+        else:
+            try:
+                with server.serving:
+                    if (server.delay_ms): time.sleep(server.delay_ms / 1000)
+                    status, body = server.respond(query)
+            finally:
+                with server.lock: server.in_flight -= 1
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class GagptServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, certs, port=0, delay_ms=0, max_in_flight=None, rate=None, capacity=None):
+        super().__init__(("127.0.0.1", port), Handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certs['server'])
+        context.load_verify_locations(certs['ca'])
+        context.verify_mode = ssl.CERT_REQUIRED
+        # the handshake happens on the first read, in the connection's thread
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.delay_ms = delay_ms
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.serving = threading.BoundedSemaphore(capacity) if capacity else contextlib.nullcontext()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.most = 0 # in flight at once
+        self._burst = max(1, (rate or 0) / 10) # a tenth of a second's worth
+        self._tokens = self._burst
+        self._stamp = time.monotonic()
+
+    def process_request(self, request, client_address):
+        with self.lock: self.connections += 1
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        pass # clients without a certificate, mostly
+
+    def admit(self):
+        # -> whether a request is served, counting it in flight if it is
+        with self.lock:
+            if (self.rate):
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+            if ((self.rate and self._tokens < 1)
+                    or (self.max_in_flight and self.in_flight >= self.max_in_flight)):
+                self.throttled += 1
+                return False
+            if (self.rate): self._tokens -= 1
+            self.in_flight += 1
+            self.most = max(self.most, self.in_flight)
+            return True
+
+    def respond(self, query):
+        # -> (status, body)
+        if (query.startswith("error")): return 500, json.dumps({"error": "internal error"})
+        return 200, json.dumps(answer(query))
+
+    def start(self):
+        # serves from a daemon thread; -> (host, port)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else "stand-in"
+    os.makedirs(directory, exist_ok=True)
+    server = GagptServer(make_certs(directory), *map(int, sys.argv[2:7]))
+    print("serving on %s:%d, client certificate in %s" % (*server.server_address, directory))
+    try: server.serve_forever()
+    except KeyboardInterrupt:
+        print("%d connections, %d requests, %d throttled" % (server.connections, server.requests, server.throttled))
@@ -1,79 +1,67 @@
-import http.client
 import json
-import ssl
-import re
-import urllib.parse
-import requests
+import sys
 import warnings
 import html
 import ansi_parser
+import fetch
+import response_cache
+import writers
 
 warnings.filterwarnings('ignore')
 
-host = '34.195.208.56'
-#print("chmod +x vvv\x08\x08s_code.sh\x0d")
-with open("audit.log", "r") as file:
-    i = -1
-    command_history = []
-    out_file = open("responses.json", "w")
-    out_file.write("[")
-    response_file = open("responses.md", "w")
-    error_file = open("error_responses.out", "w")
-    commands_file = open("commands.txt", "w")
-    while line := file.readline():
-        i += 1
-        match = re.search("d=.*u=", line)
-        if (match is None):
-            #match = re.search("(d=)?.*u=", line)
-            print("Not found: " + line)
-            continue
-        #print("Start and end: " + str(match.span()))
-        #print("First and last char: " + line[match.start()] + " | " + line[match.end()])
-        #if (line[match.start()] == 'd'):
-        #    start = match.start() + 2
-        #else:
-        #    start = match.start()
-        start = match.start() + 2
-        end = match.end() - 3
-        command = line[start:end]
-        #print("Raw: " + command)
-        command = ansi_parser.parse(command)
-        if command == "":
-            i -= 1
-            continue
-        j = 0
-        for c in command:
-            if c == '\x1a':
-                j += 1
-        if j != 0:
-            command = command_history[i - j] + command[j:]
+host = fetch.HOST
+# requests in flight at first, and at most, and how slow an answer may be
+# before fewer are sent (by default a few times the usual latency):
+#   python get_queries.py [concurrency] [max] [target ms]
+concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else fetch.CONCURRENCY
+most = int(sys.argv[2]) if len(sys.argv) > 2 else 8 * concurrency
+target = int(sys.argv[3]) / 1000 if len(sys.argv) > 3 else None
+
+def gagpt_queries(commands, commands_file, cache):
+    # the question of each gagpt command, the first time it is run; the
+    # cache remembers which have been
+    for command in commands:
         commands_file.write(command + "\n")
-        if command in command_history:
-            command_history.append(command)
-            continue
-        command_history.append(command)
         #print("Parsed: " + command)
         if (command[:5] == "gagpt"):
-            command = command[10:-1] # remove "gagpt -m"
+            question = command[10:-1] # remove "gagpt -m"
             #print("Command: " + command)
         elif (command[:6] == " gagpt"):
-            command = command [11:-1]
+            question = command [11:-1]
         else: continue
+        if (not cache.first_asked(command)): continue
         #print()
-        response = requests.get(
-            "https://" + host + "/?q=" + urllib.parse.quote_plus(command),
-            verify=False,
-            cert=("client.crt", "client.key")
-        )
-        #print(str(response.status_code) + " | " + response.text)
-        if (response.status_code > 399):
+        yield question
+
+#print("chmod +x vvv\x08\x08s_code.sh\x0d")
+if __name__ == "__main__": # feed_file starts worker processes
+    # one history for every terminal, as commands.txt was made with
+    session = ansi_parser.TerminalSession(key=None, unparsed=lambda line: print("Not found: " + line))
+    # responses.jsonl as they come, and the markdown and sheet of them;
+    # responses.json is made from responses.jsonl at the end
+    outputs = [writers.JsonLinesWriter("responses.jsonl"), writers.MarkdownWriter("responses.md"),
+               writers.XlsxWriter("responses.xlsx")]
+    error_file = open("error_responses.out", "w")
+    commands_file = open("commands.txt", "w")
+    # answers from earlier runs: a rerun after a crash only asks for the rest
+    cache = response_cache.ResponseCache("responses.db")
+    # one connection per request in flight, each with the client certificate
+    pool = fetch.ConnectionPool(host)
+    # backs off when the server throttles or slows down, and asks again on 429s and 5xxs
+    controller = fetch.Controller(start=concurrency, high=most, target=target)
+    queries = gagpt_queries(session.feed_file("audit.log"), commands_file, cache)
+    for command, status, text in fetch.fetch_all(queries, pool, concurrency, cache, controller):
+        #print(str(status) + " | " + text)
+        if (status > 399):
             error_file.write(command + "\n")
-            error_file.write(str(response.status_code) + " | " + response.text + "\n\n")
+            error_file.write(str(status) + " | " + text + "\n\n")
         else:
-            out_file.write(response.text + ",")
-            response_file.write("# Command\n")
-            response_file.write(command + "\n")
-            response_file.write("# Response\n")
-            response_file.write(response.json()["fulfillment"][0]["text"].replace('<', r'\<').replace('>', r'\>')+ "\n")
+            response = json.loads(text)
+            for output in outputs: output.write(command, response)
         print(command)
-    out_file.write(']')
+    for output in outputs: output.close()
+    writers.finalize_json("responses.jsonl", "responses.json")
+    print(str(cache.hits) + " answers from responses.db, " + str(cache.misses) + " fetched")
+    print(controller.report())
+    pool.close()
+    cache.close()
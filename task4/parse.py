@@ -1,6 +1,15 @@
 #print("chmod +x vvv\x08\x08s_code.sh\x0d")
-with open("audit.log", "r") as file:
-    out_file = open("out.log", "w")
-    while line := file.readline():
-        out_file.write(bytes(line, "utf-8").decode("unicode-escape").replace("\x0d", ""))
-        print(bytes(line, "utf-8").decode("unicode-escape").replace("\x0d", ""), end="")
+from multiprocessing import Pool
+import ansi_parser
+
+def decode(span):
+    # one chunk of audit.log, a line at a time as before
+    return "".join(bytes(line, "utf-8").decode("unicode-escape").replace("\x0d", "")
+                   for line in ansi_parser.read_chunk("audit.log", *span))
+
+if __name__ == "__main__":
+    with Pool() as pool:
+        out_file = open("out.log", "w")
+        for text in pool.imap(decode, ansi_parser.log_chunks("audit.log")):
+            out_file.write(text)
+            print(text, end="")
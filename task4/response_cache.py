@@ -0,0 +1,67 @@
+# An SQLite cache of gagpt answers for get_queries.py, so a rerun after a
+# crash (or after more of the log has come in) asks the server only what it
+# has not answered yet.  Answers are keyed by the query with its runs of
+# whitespace collapsed, and only good ones (status < 400) are kept, so
+# errors are asked again.  Every write is committed at once, so a crash
+# loses none of what was fetched.  That is all resuming takes: the log is
+# read again from the start, since the commands in it depend on the
+# up-arrow history before them, and what is answered comes from here.
+# What a run has asked is kept in a temporary table, which SQLite pages out
+# to disk, so telling repeats apart takes bounded memory however long the
+# log is.
+#
+#   python response_cache.py [responses.db]
+import sqlite3
+import sys
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    query TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+"""
+
+def normalize(query):
+    return " ".join(query.split())
+
+class ResponseCache:
+    def __init__(self, path="responses.db"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL") # WAL keeps it consistent; a crash loses at most the last few
+        self.db.executescript(SCHEMA)
+        self.db.execute("CREATE TEMP TABLE asked (command TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query):
+        # -> (status, body), or None
+        row = self.db.execute("SELECT status, body FROM responses WHERE query = ?", (normalize(query),)).fetchone()
+        if (row is None): self.misses += 1
+        else: self.hits += 1
+        return row
+
+    def put(self, query, status, body):
+        if (status >= 400): return
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                            (normalize(query), status, body, time.time()))
+
+    def first_asked(self, command):
+        # whether this run has not been given command before
+        # (the temporary table needs no commit; put() commits it in passing)
+        return self.db.execute("INSERT OR IGNORE INTO asked VALUES (?)", (command,)).rowcount == 1
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+if __name__ == '__main__':
+    cache = ResponseCache(sys.argv[1] if len(sys.argv) > 1 else "responses.db")
+    print("%d answers" % len(cache))
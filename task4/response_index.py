@@ -0,0 +1,434 @@
+# A full-text index of gagpt answers, kept on disk next to them
+# (responses.jsonl -> responses.jsonl.idx/) and read through mmap, so a
+# search touches only the postings of the words it asks for.  Each answer's
+# prompt and fulfillment[0].text are split into lowercase words; every
+# word gets the answers it is in, how often, and where (for phrases), all in
+# flat arrays, with the words themselves sorted for a binary search.  How
+# often and where are kept as varints, the positions as gaps, so the index
+# stays smaller than the answers.  Searches take words, "quoted phrases",
+# AND (or nothing), OR, NOT (or -word) and parentheses, and results are
+# ranked by BM25: the top k only, walking the postings of common words best
+# first and stopping once nothing left can make it.  Sources are JSON Lines
+# (writers.py) or a JSON array like responses.json.
+#
+#   python response_index.py build [responses.jsonl]
+#   python response_index.py search 'logic analyzer OR "i2c bus" -arduino' [--index dir] [-k 10] [--show]
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from operator import itemgetter
+
+WORD = re.compile(r"\w+")
+K1, B = 1.2, 0.75 # BM25
+IMPACTS = 256 # words in more answers than this keep their postings best first too
+
+# file -> array typecode
+FILES = {
+    'term_offsets': 'q', # into terms, one more than there are words
+    'post_starts': 'q', # into docs, per word
+    'docs': 'I', # answer numbers, ascending per word
+    'pos_starts': 'I', # into positions, one more than there are postings
+    'positions': 'B', # per posting, varints: times the word is in that answer, then the gaps between its word numbers
+    'impact_starts': 'I', # into impacts, one more than there are words
+    'impacts': 'I', # postings of words in more than IMPACTS answers, by falling weight, then answer
+    'doc_lengths': 'I', # words per answer
+    'doc_offsets': 'q', # bytes of each answer in the source, one more than there are answers
+    'prompt_offsets': 'q', # into prompts
+}
+
+def words(text):
+    return WORD.findall(text.lower())
+
+def weight(f, length, average):
+    # BM25 of a word f times in an answer `length` words long, short of the idf
+    return f * (K1 + 1) / (f + K1 * (1 - B + B * length / average))
+
+def _varint(out, n):
+    while n >= 128:
+        out.append(n & 127 | 128)
+        n >>= 7
+    out.append(n)
+
+def read_source(path):
+    # -> (byte offset, byte length, response) of each answer in a JSON Lines
+    # file or a JSON array (a trailing comma before the ] is let through)
+    if (not path.endswith(".json")):
+        with open(path, "rb") as file:
+            offset = 0
+            for line in file:
+                if (line.endswith(b"\n") and line.strip()): yield offset, len(line), json.loads(line)
+                offset += len(line)
+        return
+    with open(path, encoding="utf-8", newline="") as file: text = file.read()
+    decoder = json.JSONDecoder()
+    skip = re.compile(r"[\s,\[\]]*")
+    i = skip.match(text).end()
+    offset = len(text[:i].encode("utf-8"))
+    while i < len(text):
+        response, end = decoder.raw_decode(text, i)
+        length = len(text[i:end].encode("utf-8"))
+        yield offset, length, response
+        j = skip.match(text, end).end()
+        offset += length + len(text[end:j].encode("utf-8"))
+        i = j
+
+def build(source, directory=None):
+    directory = directory or source + ".idx"
+    postings = {} # word -> [answer, positions, answer, positions, ...]
+    doc_lengths, doc_offsets, prompts = array('I'), array('q'), []
+    end = 0
+    for n, (offset, length, response) in enumerate(read_source(source)):
+        prompt = response.get("prompt", "")
+        tokens = words(prompt) + [""] + words(response["fulfillment"][0]["text"]) # "" keeps phrases in a field
+        for i, word in enumerate(tokens):
+            if (not word): continue
+            entry = postings.get(word)
+            if (entry is None): entry = postings[word] = []
+            if (not entry or entry[-2] != n): entry += [n, array('I')]
+            entry[-1].append(i)
+        doc_lengths.append(len(tokens) - 1)
+        doc_offsets.append(offset)
+        end = offset + length
+        prompts.append(prompt.encode("utf-8"))
+    doc_offsets.append(end)
+    out = {name: array(typecode) for name, typecode in FILES.items()}
+    terms = bytearray()
+    average = sum(doc_lengths) / max(len(doc_lengths), 1)
+    docs, positions = out['docs'], out['positions']
+    out['term_offsets'].append(0)
+    out['post_starts'].append(0)
+    out['pos_starts'].append(0)
+    out['impact_starts'].append(0)
+    for word in sorted(postings, key=lambda word: word.encode("utf-8")):
+        terms += word.encode("utf-8")
+        out['term_offsets'].append(len(terms))
+        entry = postings[word]
+        start = len(docs)
+        for k in range(0, len(entry), 2):
+            docs.append(entry[k])
+            _varint(positions, len(entry[k + 1]))
+            last = 0
+            for i in entry[k + 1]:
+                _varint(positions, i - last)
+                last = i
+            out['pos_starts'].append(len(positions))
+        out['post_starts'].append(len(docs))
+        if (len(docs) - start > IMPACTS):
+            weights = {k: weight(len(entry[2 * (k - start) + 1]), doc_lengths[docs[k]], average)
+                       for k in range(start, len(docs))}
+            out['impacts'].extend(sorted(weights, key=lambda k: (-weights[k], k)))
+        out['impact_starts'].append(len(out['impacts']))
+    out['doc_lengths'], out['doc_offsets'] = doc_lengths, doc_offsets
+    out['prompt_offsets'].append(0)
+    for prompt in prompts: out['prompt_offsets'].append(out['prompt_offsets'][-1] + len(prompt))
+    os.makedirs(directory, exist_ok=True)
+    for name, column in out.items():
+        with open(os.path.join(directory, name), "wb") as file: column.tofile(file)
+    with open(os.path.join(directory, "terms"), "wb") as file: file.write(terms)
+    with open(os.path.join(directory, "prompts"), "wb") as file: file.write(b"".join(prompts))
+    stat = os.stat(source)
+    meta = {'source': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'answers': len(doc_lengths), 'words': len(postings), 'average_length': average, 'typecodes': FILES}
+    with open(os.path.join(directory, "meta.json"), "w") as file: json.dump(meta, file)
+    return directory
+
+class QueryError(ValueError):
+    pass
+
+QUERY = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|(-)|([^\s()"]+))')
+
+def parse_query(text):
+    # -> a tree of ('or', [..]), ('and', [..]), ('not', x), ('phrase', [words])
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = QUERY.match(text, pos)
+        if (m is None): raise QueryError("can't read %r" % text[pos:])
+        pos = m.end()
+        if (m.group(1)): tokens.append("(")
+        elif (m.group(2)): tokens.append(")")
+        elif (m.group(4)): tokens.append("NOT")
+        elif (m.group(5) in ("AND", "OR", "NOT")): tokens.append(m.group(5))
+        else: # x-ray is the phrase "x ray"
+            phrase = words(m.group(3) if m.group(3) is not None else m.group(5))
+            if (phrase): tokens.append(('phrase', phrase))
+    tokens.append(None)
+    i = 0
+
+    def either():
+        nonlocal i
+        terms = [both()]
+        while tokens[i] == "OR":
+            i += 1
+            terms.append(both())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def both():
+        nonlocal i
+        terms = [one()]
+        while tokens[i] not in (None, ")", "OR"):
+            if (tokens[i] == "AND"): i += 1
+            terms.append(one())
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+    def one():
+        nonlocal i
+        token = tokens[i]
+        i += 1
+        if (token == "NOT"): return ('not', one())
+        if (token == "("):
+            tree = either()
+            if (tokens[i] != ")"): raise QueryError("a ( with no )")
+            i += 1
+            return tree
+        if (isinstance(token, tuple)): return token
+        raise QueryError("expected a word, a phrase or (, not %r" % (token,))
+
+    tree = either()
+    if (tokens[i] is not None): raise QueryError("unexpected %r" % (tokens[i],))
+    return tree
+
+class ResponseIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as file: self.meta = json.load(file)
+        if (self.meta['typecodes'] != FILES): raise ValueError("%s is an older index; build it again" % directory)
+        self._maps = []
+        for name, typecode in FILES.items(): setattr(self, name, self._map(name, typecode))
+        self.terms = self._map("terms")
+        self.prompts = self._map("prompts")
+        self.answers = self.meta['answers']
+        self.words = self.meta['words']
+        self.average = self.meta['average_length']
+
+    def _map(self, name, typecode=None):
+        # the file as a memoryview, of typecode items if given
+        with open(os.path.join(self.directory, name), "rb") as file:
+            if (os.fstat(file.fileno()).st_size == 0): return memoryview(b"").cast(typecode or 'B')
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mm)
+        view = memoryview(mm)
+        return view.cast(typecode) if typecode else view
+
+    def close(self):
+        for name in list(FILES) + ["terms", "prompts"]: getattr(self, name).release()
+        for mm in self._maps: mm.close()
+
+    def term(self, word):
+        # -> the word's number, or None
+        key = word.encode("utf-8")
+        lo, hi = 0, self.words
+        offsets, terms = self.term_offsets, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = bytes(terms[offsets[mid]:offsets[mid + 1]])
+            if (found < key): lo = mid + 1
+            elif (found > key): hi = mid
+            else: return mid
+        return None
+
+    def postings(self, word):
+        # -> (start, end) of the word's answers in docs
+        t = self.term(word)
+        if (t is None): return 0, 0
+        return self.post_starts[t], self.post_starts[t + 1]
+
+    def _varints(self, k, count=None):
+        # -> the first `count` varints of posting k, or all of them
+        data = self.positions[self.pos_starts[k]:self.pos_starts[k + 1]].tolist()
+        if (count is None and max(data) < 128): return data # one byte each
+        values, n, shift = [], 0, 0
+        for byte in data:
+            n |= (byte & 127) << shift
+            if (byte & 128): shift += 7
+            else:
+                values.append(n)
+                if (len(values) == count): break
+                n = shift = 0
+        return values
+
+    def freq(self, k):
+        # -> times the word of posting k is in its answer
+        f = self.positions[self.pos_starts[k]]
+        return f if f < 128 else self._varints(k, 1)[0]
+
+    def word_positions(self, k):
+        # -> the word numbers of posting k, ascending
+        return list(accumulate(self._varints(k)[1:]))
+
+    def _weight(self, k):
+        return weight(self.freq(k), self.doc_lengths[self.docs[k]], self.average)
+
+    def _phrase(self, phrase):
+        # -> the answers with the words of phrase one after another
+        spans = [self.postings(word) for word in phrase]
+        if (not spans or any(start == end for start, end in spans)): return set()
+        rarest = min(range(len(spans)), key=lambda k: spans[k][1] - spans[k][0])
+        found = set(self.docs[spans[rarest][0]:spans[rarest][1]])
+        for start, end in spans:
+            if (len(found) * 16 < end - start): # look the few answers up
+                found = {doc for doc in found for k in (bisect_left(self.docs, doc, start, end),)
+                         if k < end and self.docs[k] == doc}
+            else: found.intersection_update(self.docs[start:end])
+        if (len(phrase) == 1): return found
+        out = set()
+        for doc in found:
+            places = []
+            for start, end in spans:
+                places.append(self.word_positions(bisect_left(self.docs, doc, start, end)))
+            # starts of the phrase: where the first word is, less where the others are not
+            starts = set(places[0])
+            for j, p in enumerate(places[1:], 1):
+                starts.intersection_update(q - j for q in p)
+                if (not starts): break
+            if (starts): out.add(doc)
+        return out
+
+    def match(self, tree):
+        # -> the set of answers a parse_query tree matches
+        kind, arg = tree
+        if (kind == 'phrase'): return self._phrase(arg)
+        if (kind == 'or'):
+            return set().union(*(self.match(term) for term in arg))
+        if (kind == 'not'): return set(range(self.answers)) - self.match(arg)
+        yes = [term for term in arg if term[0] != 'not']
+        no = [term[1] for term in arg if term[0] == 'not']
+        found = None
+        for term in sorted(yes, key=self._cost):
+            found = self.match(term) if found is None else found & self.match(term)
+            if (not found): return set()
+        if (found is None): found = set(range(self.answers))
+        for term in no: found -= self.match(term)
+        return found
+
+    def _cost(self, tree):
+        # about how many answers a term will match, to intersect the smallest first
+        if (tree[0] == 'phrase'):
+            return min((end - start for start, end in map(self.postings, tree[1])), default=0)
+        return self.answers
+
+    def _idf(self, start, end):
+        return math.log(1 + (self.answers - (end - start) + 0.5) / ((end - start) + 0.5))
+
+    def score(self, docs, words):
+        # -> {answer: BM25 over words}, of every one of docs
+        scores = dict.fromkeys(docs, 0.0)
+        for word in sorted(set(words)): # the order search() adds them in
+            start, end = self.postings(word)
+            if (start == end): continue
+            idf = self._idf(start, end)
+            if (len(scores) * 16 < end - start): # look the few answers up
+                found = ((k, doc) for doc in scores for k in (bisect_left(self.docs, doc, start, end),)
+                         if k < end and self.docs[k] == doc)
+            else: # walk the postings
+                found = ((k, doc) for k, doc in zip(range(start, end), self.docs[start:end]) if doc in scores)
+            for k, doc in found: scores[doc] += idf * self._weight(k)
+        return scores
+
+    def search(self, text, k=10):
+        # -> [(score, answer)], best first, as score() would rank them
+        tree = parse_query(text)
+        docs = self.match(tree)
+        words = _positive_words(tree)
+        if (len(docs) <= 16 * k): # few enough to score them all
+            scores = self.score(docs, words)
+            return heapq.nlargest(k, ((score, doc) for doc, score in scores.items()), key=lambda hit: (hit[0], -hit[1]))
+        return self._top(docs, words, k)
+
+    def _top(self, docs, words, k):
+        # The threshold algorithm: the answers of words with impacts come best
+        # first, from whichever word is at the highest weight, and each new
+        # one of docs is scored in full; those of the other words are scored
+        # up front.  No answer not seen yet can score more than the weights
+        # the walks are at, so once the k-th best beats those it is done.
+        spans = [] # (idf, start, end) per word
+        walks = [] # [next impact, end, idf, its weight times idf] per word with impacts
+        rest = [] # (start, end) per word without
+        for word in sorted(set(words)):
+            t = self.term(word)
+            if (t is None): continue
+            start, end = self.post_starts[t], self.post_starts[t + 1]
+            idf = self._idf(start, end)
+            spans.append((idf, start, end))
+            if (self.impact_starts[t] < self.impact_starts[t + 1]):
+                i = self.impact_starts[t]
+                walks.append([i, self.impact_starts[t + 1], idf, idf * self._weight(self.impacts[i])])
+            else: rest.append((start, end))
+        best, seen = [], set() # a heap of the k best (score, -answer)
+
+        def consider(doc):
+            seen.add(doc)
+            score = 0.0
+            for idf, start, end in spans:
+                j = bisect_left(self.docs, doc, start, end)
+                if (j < end and self.docs[j] == doc): score += idf * self._weight(j)
+            if (len(best) < k): heapq.heappush(best, (score, -doc))
+            elif ((score, -doc) > best[0]): heapq.heapreplace(best, (score, -doc))
+
+        for start, end in rest:
+            for doc in self.docs[start:end]:
+                if (doc in docs and doc not in seen): consider(doc)
+        while walks:
+            bound = 0.0
+            for walk in walks: bound += walk[3]
+            if (len(best) == k and best[0][0] > bound): break
+            walk = max(walks, key=itemgetter(3))
+            doc = self.docs[self.impacts[walk[0]]]
+            walk[0] += 1
+            if (walk[0] == walk[1]): walks.remove(walk)
+            else: walk[3] = walk[2] * self._weight(self.impacts[walk[0]])
+            if (doc in docs and doc not in seen): consider(doc)
+        if (not walks and len(best) < k): # the rest have none of the words
+            best += [(0.0, -doc) for doc in heapq.nsmallest(k - len(best), docs - seen)]
+        return [(score, -doc) for score, doc in sorted(best, reverse=True)]
+
+    def prompt(self, doc):
+        return bytes(self.prompts[self.prompt_offsets[doc]:self.prompt_offsets[doc + 1]]).decode("utf-8")
+
+    def response(self, doc):
+        # the answer as it is in the source, up to where the next one starts
+        start = self.doc_offsets[doc]
+        with open(self.meta['source'], "rb") as file:
+            data = os.pread(file.fileno(), self.doc_offsets[doc + 1] - start, start)
+        return json.JSONDecoder().raw_decode(data.decode("utf-8"))[0]
+
+def _positive_words(tree):
+    kind, arg = tree
+    if (kind == 'phrase'): return list(arg)
+    if (kind == 'not'): return []
+    return [word for term in arg for word in _positive_words(term)]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_ = commands.add_parser("build")
+    build_.add_argument("source", nargs='?', default="responses.jsonl")
+    build_.add_argument("--index")
+    search_ = commands.add_parser("search")
+    search_.add_argument("query")
+    search_.add_argument("--index", default="responses.jsonl.idx")
+    search_.add_argument("-k", type=int, default=10)
+    search_.add_argument("--show", action='store_true', help="print the answers too")
+    args = parser.parse_args()
+    if (args.command == "build"):
+        t = time.perf_counter()
+        directory = build(args.source, args.index)
+        print("%s in %.2f s" % (directory, time.perf_counter() - t))
+    else:
+        index = ResponseIndex(args.index)
+        t = time.perf_counter()
+        try: hits = index.search(args.query, args.k)
+        except QueryError as e: parser.error(str(e))
+        print("%d shown, %.3f ms" % (len(hits), (time.perf_counter() - t) * 1000))
+        for score, doc in hits:
+            print("%7.3f  %5d  %s" % (score, doc, index.prompt(doc)))
+            if (args.show): print(index.response(doc)["fulfillment"][0]["text"] + "\n")
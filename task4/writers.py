@@ -0,0 +1,148 @@
+# Writers for the answers get_queries.py collects, each fed one command
+# (the query that was sent) and its response (the JSON object the server
+# sent) at a time and holding none of them:
+# JSON Lines as the stream everything else is made from, a JSON array
+# finalized from that, the markdown of prompts and answers, and an xlsx
+# sheet of the fields, written straight into its zip.  Any of them can also
+# be made afterwards from the JSON Lines, with each response's prompt as
+# its command.
+#
+#   python writers.py [responses.jsonl] [--json responses.json] [--md responses.md] [--xlsx responses.xlsx]
+import argparse
+import json
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+class JsonLinesWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, command, response):
+        self.file.write(json.dumps(response, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self.file.close()
+
+def read_lines(path):
+    # the responses in a JSON Lines file; a last line cut off by a crash is left out
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if (line.endswith("\n")): yield json.loads(line)
+
+def finalize_json(jsonl, path):
+    # a JSON array of what is in jsonl, written a line at a time, and only
+    # put in place once it is whole
+    with open(jsonl, encoding="utf-8") as source, open(path + ".tmp", "w", encoding="utf-8") as file:
+        file.write("[")
+        first = True
+        for line in source:
+            if (not line.endswith("\n")): break
+            if (not first): file.write(",")
+            file.write(line)
+            first = False
+        file.write("]\n")
+    os.replace(path + ".tmp", path)
+
+MARKDOWN = str.maketrans({'<': r'\<', '>': r'\>'})
+
+class MarkdownWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, command, response):
+        self.file.write("# Command\n" + command + "\n# Response\n")
+        self.file.write(response["fulfillment"][0]["text"].translate(MARKDOWN) + "\n")
+
+    def close(self):
+        self.file.close()
+
+COLUMNS = ("fulfillment", "id", "lang", "model", "prompt", "upstream")
+CELL = 32767 # characters Excel keeps in a cell
+NOT_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+XLSX_PARTS = {
+    "[Content_Types].xml": '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/></Types>',
+    "_rels/.rels": '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/></Relationships>',
+    "xl/workbook.xml": '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="responses" sheetId="1" r:id="rId1"/></sheets></workbook>',
+    "xl/_rels/workbook.xml.rels": '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/></Relationships>',
+}
+
+def column_name(n):
+    # 0 -> A, 25 -> Z, 26 -> AA
+    name = ""
+    n += 1
+    while n:
+        n, k = divmod(n - 1, 26)
+        name = chr(ord('A') + k) + name
+    return name
+
+class XlsxWriter:
+    # One sheet: a header of the columns, then a row per response with its
+    # number in A, as responses.xlsx was laid out.  Fields that are not
+    # strings are written as Python shows them.  Rows go into the zip as
+    # they come; the parts that say what is in it are written on close.
+    def __init__(self, path, columns=COLUMNS):
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.sheet = self.zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self.columns = columns
+        self.rows = 0
+        self._put('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                  '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+        self._row([None] + list(columns))
+
+    def _put(self, text):
+        self.sheet.write(text.encode("utf-8"))
+
+    def _row(self, values):
+        self.rows += 1
+        cells = []
+        for i, value in enumerate(values):
+            if (value is None): continue
+            ref = column_name(i) + str(self.rows)
+            if (isinstance(value, int)):
+                cells.append('<c r="%s"><v>%d</v></c>' % (ref, value))
+                continue
+            text = NOT_XML.sub("", value if isinstance(value, str) else str(value))[:CELL]
+            cells.append('<c r="%s" t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % (ref, escape(text)))
+        self._put('<row r="%d">%s</row>' % (self.rows, "".join(cells)))
+
+    def write(self, command, response):
+        self._row([self.rows - 1] + [response.get(column) for column in self.columns])
+
+    def close(self):
+        self._put('</sheetData></worksheet>')
+        self.sheet.close()
+        for name, text in XLSX_PARTS.items(): self.zip.writestr(name, text)
+        self.zip.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("jsonl", nargs='?', default="responses.jsonl")
+    parser.add_argument("--json")
+    parser.add_argument("--md")
+    parser.add_argument("--xlsx")
+    args = parser.parse_args()
+    if (args.json): finalize_json(args.jsonl, args.json)
+    writers = ([MarkdownWriter(args.md)] if args.md else []) + ([XlsxWriter(args.xlsx)] if args.xlsx else [])
+    if (writers):
+        for response in read_lines(args.jsonl):
+            for writer in writers: writer.write(response.get("prompt", ""), response)
+        for writer in writers: writer.close()
@@ -0,0 +1,64 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Instruction throughput of thrower.py with interpreter debug logging on
+# (written to /dev/null by the listener thread), off by level, and disabled.
+#
+#   ./bench_logging.py [iterations]
+import logging
+import os
+import sys
+import time
+
+import thrower
+
+PROGRAM = """
+resolve "x"
+store r1
+repeat {n} {{
+    load r1
+    store r2
+    if r2 == "x" {{
+        sleep 0
+    }}
+    assert r2 != r3
+}}
+"""
+
+def bench(cls, tree, instructions):
+    budget = cls.Budget(remaining_compute=10**12, deadline=time.time() + 3600)
+    I = cls(budget, '127.0.0.1', 0)
+    I._resolve = lambda domain, t: str(domain)
+    I.STATE[3] = ''
+    t = time.perf_counter()
+    if hasattr(I, 'compile'):
+        I.execute(I.compile(tree))
+    else:
+        I.eval(tree)
+    return instructions / (time.perf_counter() - t)
+
+def main(n=20000):
+    tree = thrower.parse(PROGRAM.format(n=n))
+    instructions = 3 + 5*n
+    for handler in thrower.LOG_LISTENER.handlers:
+        handler.setStream(open(os.devnull, 'w'))
+    modes = [
+        ('debug', lambda: thrower.interpreter_logger.setLevel(logging.DEBUG)),
+        ('off (level)', lambda: thrower.interpreter_logger.setLevel(logging.WARNING)),
+        ('disabled', lambda: logging.disable(logging.CRITICAL)),
+    ]
+    print(f'{instructions} instructions, instructions/sec')
+    for name, setup in modes:
+        setup()
+        tree_walk = bench(thrower.ThrowerInterpreter, tree, instructions)
+        compiled = bench(thrower.CompiledThrowerInterpreter, tree, instructions)
+        print(f'{name:<12} tree walk {tree_walk:12,.0f}   compiled {compiled:12,.0f}')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
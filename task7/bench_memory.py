@@ -0,0 +1,90 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Memory of a generated program with `n` instructions (no resolves, so no
+# nameserver is needed), measured with tracemalloc: the tree walker on a
+# parse tree with a Meta per node vs. the compiled plan, which keeps no
+# tree, on a tree with a Meta per line.  The compiled run parses from a warm
+# cache; a cold parse briefly holds both trees.  The plan (with its static
+# cost, which execute() drops once checked) is compared with the walker's
+# tree, and the peaks with each other.
+#
+#   ./bench_memory.py [instructions]
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ['THROWER_CACHE'] = tempfile.mkdtemp() # parse() caches trees
+import thrower
+
+def program(n, seed=1):
+    random.seed(seed)
+    lines = ['sleep 0'] + [f'store r{i}' for i in range(16)]
+    for _ in range(n):
+        r = random.randrange(16)
+        k = random.random()
+        if k < .3: lines.append(f'load r{r}')
+        elif k < .6: lines.append(f'store r{r}')
+        elif k < .7: lines.append('sleep 0')
+        elif k < .8: lines.append(f'if r{r} == 0 {{\n load r{r}\n store r{(r + 1) % 16}\n}}')
+        elif k < .9: lines.append(f'repeat 3 {{\n load r{r}\n store r{r}\n}}')
+        else: lines.append(f'assert r{r} != "x"')
+    return '\n'.join(lines)
+
+def budget():
+    return thrower.ThrowerInterpreter.Budget(remaining_compute=10**9, deadline=time.time() + 3600)
+
+def measure(name, parse, prepare, run):
+    # parse: () -> tree, prepare: tree -> state kept while running, run: state -> None
+    # -> (peak, kept, tree) bytes
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    tree = parse()
+    tree_bytes = tracemalloc.get_traced_memory()[0] - base
+    state = prepare(tree)
+    del tree
+    gc.collect()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    t = time.perf_counter()
+    run(state)
+    elapsed = time.perf_counter() - t
+    run_peak = tracemalloc.get_traced_memory()[1] - kept
+    tracemalloc.stop()
+    print(f'{name:<10} tree {tree_bytes / 1e6:7.1f} MB   peak {(peak - base) / 1e6:7.1f} MB   '
+          f'kept while running {(kept - base) / 1e6:7.1f} MB   run {elapsed:6.3f} s '
+          f'(+{run_peak / 1e3:.0f} kB)')
+    return peak - base, kept - base, tree_bytes
+
+def main(n=20000):
+    source = program(n)
+    print(f'{n} generated instructions')
+
+    def walker_prepare(tree):
+        return thrower.ThrowerInterpreter(budget(), '127.0.0.1', 0), tree
+    walker_peak, _, _ = measure('tree walk', lambda: thrower.PARSER.parse(source), walker_prepare,
+                                lambda state: state[0].eval(state[1]))
+
+    thrower.parse(source) # warm the cache
+    def compiled_prepare(tree):
+        I = thrower.CompiledThrowerInterpreter(budget(), '127.0.0.1', 0)
+        return I, I.compile(tree)
+    peak, plan, tree = measure('compiled', lambda: thrower.parse(source), compiled_prepare,
+                               lambda state: state[0].execute(state[1]))
+    print(f'plan {plan / 1e6:.1f} MB ({plan / tree:.2f}x the tree it is compiled from), '
+          f'peak {peak / 1e6:.1f} MB ({peak / walker_peak:.2f}x the tree walk)')
+
+if __name__ == '__main__':
+    sys.setrecursionlimit(10000)
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,97 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Execution time of generated programs with the compile-time optimizer off
+# and on (compile time reported separately), against an in-process stand-in
+# nameserver and on virtual clocks.
+# Every run is also checked against the tree walker: same exit, failing
+# line, registers and remaining compute.  So are a few programs that stop
+# (unset register, failing assert) before they would run out of budget.
+#
+#   ./bench_optimize.py [programs] [seed]
+import random
+import sys
+import time
+
+import nameserver
+import thrower
+
+def program(size):
+    # constants from sleeps, copies, checks of registers against literals,
+    # and repeats that only shuffle registers
+    r = lambda: f'r{random.randrange(8)}'
+    lines = ['resolve "a"', 'store r0', 'resolve "nx"', 'store r1', 'sleep 0']
+    lines += [f'store r{i}' for i in range(2, 8)]
+    for _ in range(size):
+        k = random.random()
+        if k < .2: lines += [f'sleep {random.randrange(4)}', f'store {r()}']
+        elif k < .4: lines += [f'load {r()}', f'store {r()}']
+        elif k < .6:
+            lit = random.choice(['0', '1', '2', '3', '""', '"127.0.0.1"'])
+            lines.append(f'if {r()} {random.choice(["==", "!="])} {lit} {{\n load {r()}\n store {r()}\n}}')
+        elif k < .7: lines.append(f'assert {r()} != "x"')
+        elif k < .95:
+            body = '\n'.join(f'{random.choice(["load", "store"])} {r()}' for _ in range(random.randint(2, 6)))
+            lines.append(f'repeat {random.randint(2, 200)} {{\n{body}\n}}')
+        else: lines += [f'resolve {r()}', f'store {r()}']
+    return '\n'.join(lines)
+
+STOPS = [
+    'load r1\nrepeat 20000 {\n resolve "a"\n}',
+    'store r1\nrepeat 20000 {\n resolve "a"\n}',
+    'sleep 0\nstore r1\nassert r1 == ""\nrepeat 20000 {\n resolve "a"\n}',
+    'sleep 0\nstore r1\nif r1 == 0 {\n load r2\n}\nrepeat 20000 {\n resolve "a"\n}',
+]
+
+def run(cls, tree, target, optimize=True):
+    clock = thrower.VirtualClock()
+    I = cls(cls.Budget(remaining_compute=200000, deadline=clock.now + 900), *target)
+    I.clock = clock
+    I.OPTIMIZE = optimize
+    compiled = t = time.perf_counter()
+    try:
+        if optimize is None:
+            I.eval(tree)
+        else:
+            plan = I.compile(tree)
+            compiled = time.perf_counter()
+            I.execute(plan)
+        outcome = None
+    except thrower.InterpreterException as e:
+        outcome = (type(e).__name__, e.t.meta.line, e.message)
+    finally:
+        I.transport.close()
+    return (compiled - t, time.perf_counter() - compiled), (outcome, I.STATE, I.budget.remaining_compute)
+
+def main(n=50, seed=1):
+    random.seed(seed)
+    target = nameserver.serve()
+    thrower.set_logging(quiet=True)
+    for source in STOPS:
+        tree = thrower.parse(source)
+        _, reference = run(thrower.ThrowerInterpreter, tree, target, optimize=None)
+        for optimize in (False, True):
+            _, result = run(thrower.CompiledThrowerInterpreter, tree, target, optimize)
+            assert result == reference, (source, result, reference)
+    trees = [thrower.parse(program(200)) for _ in range(n)]
+    totals = {'off': [0, 0], 'on': [0, 0]}
+    for tree in trees:
+        _, reference = run(thrower.ThrowerInterpreter, tree, target, optimize=None)
+        for name, optimize in (('off', False), ('on', True)):
+            seconds, result = run(thrower.CompiledThrowerInterpreter, tree, target, optimize)
+            assert result == reference, (name, result, reference)
+            totals[name][0] += seconds[0]
+            totals[name][1] += seconds[1]
+    (c0, x0), (c1, x1) = totals['off'], totals['on']
+    print(f'{n} programs, same results as the tree walker')
+    print(f'optimizer off  compile {c0:7.3f} s   execute {x0:7.3f} s')
+    print(f'optimizer on   compile {c1:7.3f} s   execute {x1:7.3f} s   ({x0 / x1:.1f}x)')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,69 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Round trips payload.py over sizes around its chunk and block edges (its
+# base32hex checked against the base64 module's), and sploit.txt's names, then times encoding a `megabytes` MB payload into a
+# program and decoding it back.
+#
+#   ./bench_payload.py [megabytes]
+import base64
+import io
+import os
+import sys
+import time
+
+import payload
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def roundtrip(data, labels=payload.LABELS):
+    names = list(payload.encode(io.BytesIO(data), labels))
+    for name in names:
+        assert len(name) + len(payload.DNS_SUFFIX) <= payload.MAX_NAME, name
+        assert all(len(label) <= 63 for label in name.split('.')), name
+    out = io.StringIO()
+    payload.write_program(names, out, sleep=0)
+    assert payload.decode(payload.program_names(out.getvalue())) == data, (len(data), labels)
+    return names
+
+def check():
+    size = payload.chunk_size()
+    block = payload.BLOCK // size * size
+    sizes = [0, 1, 4, 5, 6, size - 1, size, size + 1, 2 * size, block - 1, block, block + 1, 2 * block + 7]
+    std = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ234567=', payload.ALPHABET + payload.PAD.encode())
+    for n in sizes:
+        data = os.urandom(n)
+        assert payload.b32hex(data) == base64.b32encode(data).translate(std).decode(), n
+        names = roundtrip(data)
+        assert len(names) == -(-n // size), (n, len(names))
+    for labels in (1, 2):
+        roundtrip(os.urandom(1000), labels)
+    with open(os.path.join(HERE, 'sploit.txt')) as fobj:
+        names = payload.program_names(fobj.read())
+    for name in names: # made by testing/K.noise.go
+        data = payload.decode_name(name)
+        assert list(payload.encode(io.BytesIO(data))) == [name], name
+    print(f'round trips ok: {len(sizes)} sizes, 1 and 2 labels, sploit.txt')
+
+def main(megabytes=8):
+    check()
+    data = os.urandom(megabytes << 20)
+    t = time.perf_counter()
+    out = io.StringIO()
+    payload.write_program(payload.encode(io.BytesIO(data)), out)
+    encoded = time.perf_counter() - t
+    text = out.getvalue()
+    t = time.perf_counter()
+    back = payload.decode(payload.program_names(text))
+    decoded = time.perf_counter() - t
+    assert back == data
+    print(f'{megabytes} MB -> {text.count(chr(10))} resolves, {len(text) / 1e6:.1f} MB of program')
+    print(f'encode {encoded:6.3f} s  {megabytes / encoded:6.1f} MB/s')
+    print(f'decode {decoded:6.3f} s  {megabytes / decoded:6.1f} MB/s')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,61 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Wall time of a resolve-heavy program against a stand-in nameserver that
+# takes `delay` ms per answer, run in order vs. with independent resolves
+# prefetched (run --parallel).  Both runs must end with the same registers.
+# Then the same against a server that answers one query at a time, slowly
+# enough that the last prefetched answers come more than the resolve
+# timeout after they were sent; they must still be waited for.
+#
+#   ./bench_prefetch.py [resolves] [delay ms]
+import sys
+import time
+
+import nameserver
+import thrower
+
+def program(n):
+    # n literal resolves stored to registers, a resolve of a register the run
+    # sets (not prefetched), then checks that read them; n <= 25 fits the
+    # default budget
+    lines = []
+    for i in range(n):
+        lines += [f'resolve "q{i}"', f'store r{i}']
+    lines += ['resolve "nx"', 'store r100', 'resolve r0', 'store r101', 'assert r100 == ""']
+    lines += [f'assert r{i} == "127.0.0.1"' for i in range(n)]
+    return '\n'.join(lines)
+
+def run(tree, ip, port, parallel):
+    I = thrower.CompiledThrowerInterpreter(thrower.default_budget(), ip, port)
+    I.PREFETCH_RESOLVES = parallel
+    t = time.perf_counter()
+    try:
+        I.execute(I.compile(tree))
+    finally:
+        I.transport.close()
+    return time.perf_counter() - t, I.STATE, I.budget.remaining_compute
+
+def compare(n, delay, serial=False):
+    ip, port = nameserver.serve(delay_ms=delay, serial=serial)
+    tree = thrower.parse(program(n))
+    print(f'{n + 2} resolves, {delay} ms per answer' + (', one at a time' if serial else ''))
+    seq = run(tree, ip, port, False)
+    par = run(tree, ip, port, True)
+    print(f'in order     {seq[0]:7.3f} s')
+    print(f'prefetched   {par[0]:7.3f} s   ({seq[0] / par[0]:.1f}x)')
+    assert seq[1] == par[1] and seq[2] == par[2], 'registers or budget differ'
+
+def main(n=20, delay=100):
+    thrower.set_logging(quiet=True)
+    compare(n, delay)
+    compare(8, 900, serial=True)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,55 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Per-resolve overhead of thrower.py against a local stand-in nameserver:
+# a fresh dns.resolver.Resolver per query (the old _resolve) vs. the pooled
+# DNSTransport over UDP and over a persistent TCP connection.
+#
+#   ./bench_resolve.py [queries]
+import statistics
+import sys
+import time
+
+import dns.resolver
+
+import nameserver
+import thrower
+
+def resolver_per_query(ip, port, qname):
+    resolver = dns.resolver.Resolver(configure=False)
+    resolver.domain = 'localhost.localhost'
+    resolver.nameservers = [ip]
+    resolver.nameserver_ports = {ip: port}
+    resolver.timeout = 5
+    return resolver.resolve(qname, rdtype='A', raise_on_no_answer=False).response
+
+def bench(name, query, n):
+    samples = []
+    for i in range(n):
+        t = time.perf_counter()
+        query(f'q{i % 16}.example.com.')
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    print(f'{name:<22} mean {statistics.mean(samples)*1e6:8.1f} us   '
+          f'p50 {samples[len(samples)//2]*1e6:8.1f} us   '
+          f'p99 {samples[int(len(samples)*.99)]*1e6:8.1f} us')
+
+def main(n=2000):
+    ip, port = nameserver.serve()
+    print(f'{n} queries against {ip}:{port}')
+    bench('Resolver per query', lambda q: resolver_per_query(ip, port, q), n)
+    udp = thrower.DNSTransport(ip, port, 5)
+    bench('DNSTransport udp', udp.query, n)
+    tcp = thrower.DNSTransport(ip, port, 5, tcp=True)
+    bench('DNSTransport tcp', tcp.query, n)
+    udp.close()
+    tcp.close()
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -0,0 +1,66 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Startup benchmark for thrower.py: Earley parser built at import (the old
+# behaviour) vs. the cached LALR parser and parse-tree cache.
+#
+#   ./bench_startup.py [program.txt] [runs]
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# each child prints the seconds spent building the parser and parsing
+EARLEY = """
+import time, thrower
+from lark import Lark
+t = time.perf_counter()
+Lark(thrower.grammar, propagate_positions=True).parse(open({program!r}).read())
+print(time.perf_counter() - t)
+"""
+
+LALR = """
+import time, thrower
+t = time.perf_counter()
+thrower.parse(open({program!r}).read())
+print(time.perf_counter() - t)
+"""
+
+def run(code, cache_dir):
+    env = dict(os.environ, THROWER_CACHE=cache_dir)
+    t = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return time.perf_counter() - t, float(out.split()[-1])
+
+def bench(name, code, runs, fresh_cache):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results = []
+        for _ in range(runs):
+            if fresh_cache:
+                for f in os.listdir(cache_dir):
+                    os.unlink(os.path.join(cache_dir, f))
+            results.append(run(code, cache_dir))
+    total = statistics.median(r[0] for r in results) * 1000
+    parse = statistics.median(r[1] for r in results) * 1000
+    print(f'{name:<24} process {total:8.1f} ms   parser+parse {parse:8.2f} ms')
+
+def main(program='sploit.txt', runs=10):
+    program = os.path.abspath(program)
+    print(f'{program}, median of {runs} runs')
+    bench('earley', EARLEY.format(program=program), runs, fresh_cache=True)
+    bench('lalr, cold cache', LALR.format(program=program), runs, fresh_cache=True)
+    bench('lalr, warm cache', LALR.format(program=program), runs, fresh_cache=False)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:3]))
